@@ -0,0 +1,191 @@
+"""
+Benchmark dell'assegnazione droni -> target al variare della dimensione dello sciame e del solver.
+
+Per ogni (N, metodo) misura separatamente:
+    - costruzione della matrice dei costi (compute_cost_matrix), dove il metodo la usa
+    - solo il LAP sulla matrice già costruita (linear_sum_assignment), per il metodo 'dense'
+    - risoluzione completa (solve_assignment)
+    - picco di memoria (tracemalloc) delle fasi
+    - qualità della soluzione (distanza totale e massima)
+
+I tempi vengono misurati in esecuzioni senza tracemalloc (che rallenta le allocazioni), il picco di memoria
+in un'esecuzione separata. tracemalloc vede solo il processo corrente: con il metodo 'partitioned' e più worker
+la memoria dei processi worker non è inclusa (il record lo indica con peak_excludes_workers).
+
+Gli sciami sintetici sono deterministici (seed fisso) e generati con i generatori di formazioni esistenti:
+partenza su griglia a terra, arrivo su una sfera in quota.
+
+Uso:
+    python -m benchmarks.assignment_benchmark --sizes 10 100 1000 --methods dense sparse --output bench.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+from scipy.optimize import linear_sum_assignment
+
+from core.assignment_solver import ASSIGNMENT_METHODS, compute_cost_matrix, solve_assignment
+from core.formation_generator import grid_formation, sphere_formation
+
+
+DEFAULT_SIZES = (10, 100, 1000, 2000, 5000, 10000, 20000)
+
+# oltre queste dimensioni il metodo richiede troppa memoria/tempo (matrice densa N x N): viene saltato
+DEFAULT_MAX_SIZE = {
+    "dense": 5000,
+    "bottleneck": 2000,
+    "sparse": 20000,
+    "partitioned": 20000,
+}
+
+# metodi che costruiscono la matrice densa dei costi
+DENSE_COST_METHODS = ("dense", "bottleneck")
+
+
+def make_swarm(num_drones, seed=0, spacing=2.0, altitude=20.0):
+    """
+    Genera un problema di assegnazione sintetico e deterministico.
+
+    :return: (drone_positions (N, 3), target_positions (N, 3))
+    """
+    np.random.seed(seed)    # i generatori di formazioni usano il generatore globale di numpy
+    starts = grid_formation(num_drones, spacing=spacing, center=(0, 0, 0), plane='xy').target_positions
+    radius = max(spacing * np.sqrt(num_drones / (4 * np.pi)), 1.0)    # densità sulla sfera simile alla griglia
+    targets = sphere_formation(num_drones, radius=radius, center=(0, 0, altitude + radius)).target_positions
+    return starts, targets
+
+
+def _time(func, *args, repeats=1, **kwargs):
+    """Esegue func repeats volte senza tracemalloc e ritorna (risultato, secondi della ripetizione migliore)."""
+    times, result = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = func(*args, **kwargs)
+        times.append(time.perf_counter() - t0)
+    return result, min(times)
+
+
+def _peak_memory(func, *args, **kwargs):
+    """Esegue func una volta sotto tracemalloc e ritorna il picco di memoria in byte (solo processo corrente)."""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return int(peak)
+
+
+def benchmark_case(num_drones, method, repeats=1, seed=0, solver_options=None):
+    """
+    Misura un singolo caso (N, metodo). Con repeats > 1 si tiene il tempo migliore.
+
+    :return: dict con i risultati
+    """
+    solver_options = dict(solver_options or {})
+    starts, targets = make_swarm(num_drones, seed=seed)
+
+    record = {"num_drones": int(num_drones), "method": method, "options": solver_options}
+
+    if method in DENSE_COST_METHODS:
+        dtype = solver_options.get("dtype", np.float64)
+        cost_matrix, record["cost_matrix_s"] = _time(compute_cost_matrix, starts, targets, dtype=dtype,
+                                                     repeats=repeats)
+        record["cost_matrix_peak_bytes"] = _peak_memory(compute_cost_matrix, starts, targets, dtype=dtype)
+        if method == "dense":
+            _, record["solver_s"] = _time(linear_sum_assignment, cost_matrix, repeats=repeats)
+        del cost_matrix
+
+    perm, record["assignment_s"] = _time(solve_assignment, starts, targets, method=method, repeats=repeats,
+                                         **solver_options)
+    record["assignment_peak_bytes"] = _peak_memory(solve_assignment, starts, targets, method=method,
+                                                   **solver_options)
+    # sotto cell_size il metodo partizionato risolve in-process, senza worker
+    if (method == "partitioned" and solver_options.get("max_workers") != 1
+            and num_drones > solver_options.get("cell_size", 1000)):
+        record["peak_excludes_workers"] = True
+
+    distances = np.linalg.norm(targets[perm] - starts, axis=1)
+    record["total_distance"] = float(distances.sum())
+    record["max_distance"] = float(distances.max())
+    return record
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, methods=ASSIGNMENT_METHODS, repeats=1, seed=0, max_size=None,
+                  solver_options=None, verbose=True):
+    """
+    Esegue il benchmark su tutte le combinazioni (N, metodo).
+
+    :param max_size: dict metodo -> N massimo (default DEFAULT_MAX_SIZE); i casi oltre il limite vengono saltati
+    :return: dict serializzabile in JSON con metadati e risultati
+    """
+    limits = dict(DEFAULT_MAX_SIZE)
+    limits.update(max_size or {})
+
+    results = []
+    for num_drones in sizes:
+        for method in methods:
+            if num_drones > limits.get(method, np.inf):
+                results.append({"num_drones": int(num_drones), "method": method, "skipped": True})
+                continue
+
+            record = benchmark_case(num_drones, method, repeats=repeats, seed=seed, solver_options=solver_options)
+            results.append(record)
+            if verbose:
+                print(f"N={num_drones:>6} {method:<12} "
+                      f"cost_matrix={record.get('cost_matrix_s', float('nan')):8.4f}s "
+                      f"solver={record.get('solver_s', float('nan')):8.4f}s "
+                      f"assignment={record['assignment_s']:8.4f}s "
+                      f"peak={record['assignment_peak_bytes'] / 2**20:8.1f} MiB "
+                      f"total_dist={record['total_distance']:.1f}", file=sys.stderr)
+
+    return {
+        "benchmark": "assignment",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "seed": seed,
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark assegnazione droni -> target")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--methods", nargs="+", default=list(ASSIGNMENT_METHODS), choices=ASSIGNMENT_METHODS)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-limits", action="store_true", help="non saltare i casi troppo grandi")
+    parser.add_argument("--output", help="file JSON di output (default: stdout)")
+    args = parser.parse_args(argv)
+
+    max_size = {m: np.inf for m in ASSIGNMENT_METHODS} if args.no_limits else None
+    report = run_benchmark(args.sizes, args.methods, repeats=args.repeats, seed=args.seed, max_size=max_size)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Controlli di coerenza dei percorsi ottimizzati contro le implementazioni di riferimento.
+
+    - riassegnazione incrementale (reassign_incremental) contro un linear_sum_assignment da zero,
+      su una sequenza di perturbazioni casuali di droni e target: il costo totale deve coincidere
+    - metodi del controllo collisioni contro 'all_pairs' su sciami casuali con ritardi di partenza:
+        i metodi campionati ('broad_phase', 'aabb') devono ritornare le stesse violazioni di 'all_pairs';
+        i metodi a tempo continuo ('exact', 'adaptive', una violazione per coppia) devono trovare tutte le
+        coppie del campionamento, al più prima, con la distanza pari a min_distance al primo istante di
+        violazione, e coincidere tra loro
+
+Uso:
+    python -m benchmarks.self_check --perturbations 200 --swarms 5
+Esce con codice 1 se un controllo fallisce.
+"""
+import argparse
+import sys
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from core.assignment_solver import compute_cost_matrix, reassign_incremental, solve_assignment_with_duals
+from core.trajectory_generator import generate_trajectories
+from core.trajectory_validator import validate_swarm_trajectories
+from models.drone import Drone
+
+
+# tolleranze: costo dell'assegnazione e istanti di prima violazione a tempo continuo
+COST_TOL = 1e-6
+TIME_TOL = 1e-6
+
+# metodi che campionano come 'all_pairs' e metodi a tempo continuo (una violazione per coppia)
+SAMPLED_METHODS = ("broad_phase", "aabb")
+CONTINUOUS_METHODS = ("exact", "adaptive")
+
+
+def check_incremental_assignment(num_perturbations=200, num_drones=40, max_changes=4, seed=0):
+    """
+    Applica num_perturbations perturbazioni successive (alcuni droni e/o target spostati) e confronta il costo
+    della soluzione riparata con quello di un linear_sum_assignment risolto da zero.
+
+    :return: lista di messaggi di errore (vuota se tutto coincide)
+    """
+    rng = np.random.default_rng(seed)
+    drones = rng.uniform(0, 30, (num_drones, 3))
+    targets = rng.uniform(0, 30, (num_drones, 3))
+    state = solve_assignment_with_duals(drones, targets)
+
+    errors = []
+    for k in range(num_perturbations):
+        drones, targets = drones.copy(), targets.copy()
+        if rng.random() < 0.7:
+            moved = rng.choice(num_drones, rng.integers(1, max_changes + 1), replace=False)
+            drones[moved] += rng.normal(0, 3, (len(moved), 3))
+        if rng.random() < 0.7:
+            moved = rng.choice(num_drones, rng.integers(1, max_changes + 1), replace=False)
+            targets[moved] += rng.normal(0, 3, (len(moved), 3))
+
+        state = reassign_incremental(state, drones, targets)
+
+        cost = compute_cost_matrix(drones, targets)
+        row_ind, col_ind = linear_sum_assignment(cost)
+        reference = cost[row_ind, col_ind].sum()
+        incremental = cost[np.arange(num_drones), state.col_ind].sum()
+
+        if len(np.unique(state.col_ind)) != num_drones:
+            errors.append(f"perturbazione {k}: l'assegnazione incrementale non è una permutazione")
+        elif abs(incremental - reference) > COST_TOL * max(1.0, reference):
+            errors.append(f"perturbazione {k}: costo incrementale {incremental:.9f} != ottimo {reference:.9f}")
+
+    return errors
+
+
+def _random_swarm(num_drones, profile, rng, extent=9.0, duration=6.0):
+    """Sciame casuale in un volume ristretto (molte violazioni), con ritardi di partenza casuali."""
+    starts = rng.uniform(0, extent, (num_drones, 3))
+    ends = rng.uniform(0, extent, (num_drones, 3))
+    drones = [Drone(i, starts[i], 3.0, 2.0) for i in range(num_drones)]
+    start_times = {i: float(rng.uniform(0, 2)) for i in range(num_drones)}
+    trajectories = generate_trajectories(drones, {i: ends[i] for i in range(num_drones)}, duration,
+                                         start_times=start_times, profile=profile, max_jerk=3.0)
+    return drones, trajectories
+
+
+def _check_continuous(label, method, first, sampled_first, trajectories, min_distance):
+    """
+    Violazioni a tempo continuo {coppia: primo istante} contro il primo istante campionato di ogni coppia.
+
+    :return: lista di messaggi di errore
+    """
+    errors = []
+    missed = set(sampled_first) - set(first)
+    if missed:
+        errors.append(f"{label}: '{method}' non trova {len(missed)} coppie del campionamento")
+    late = [pair for pair in set(sampled_first) & set(first) if first[pair] > sampled_first[pair] + TIME_TOL]
+    if late:
+        errors.append(f"{label}: '{method}' riporta {len(late)} violazioni dopo il primo campione")
+
+    # al primo istante di violazione la distanza vale min_distance (salvo violazioni già a t = 0)
+    for (a, b), t in first.items():
+        distance = np.linalg.norm(trajectories[a].position(t) - trajectories[b].position(t))
+        if t > 0 and abs(distance - min_distance) > 1e-6:
+            errors.append(f"{label}: '{method}' coppia {(a, b)} a t={t:.6f} distanza {distance:.6f}")
+            break
+    return errors
+
+
+def check_collision_methods(num_swarms=5, num_drones=60, min_distance=0.5, dt=0.01, seed=0):
+    """
+    Confronta i metodi del controllo collisioni con 'all_pairs' su num_swarms sciami casuali
+    (profili minimum jerk e S-curve alternati).
+
+    :return: lista di messaggi di errore (vuota se tutto coincide)
+    """
+    rng = np.random.default_rng(seed)
+    errors = []
+
+    for k in range(num_swarms):
+        profile = "minimum_jerk" if k % 2 == 0 else "scurve"
+        drones, trajectories = _random_swarm(num_drones, profile, rng)
+        label = f"sciame {k} ({profile})"
+
+        reference = validate_swarm_trajectories(trajectories, drones, min_distance, dt, method="all_pairs")
+        for method in SAMPLED_METHODS:
+            result = validate_swarm_trajectories(trajectories, drones, min_distance, dt, method=method)
+            if result != reference:
+                errors.append(f"{label}: '{method}' ritorna {len(result)} violazioni, 'all_pairs' {len(reference)}")
+
+        # primo istante campionato di violazione per coppia
+        sampled_first = {}
+        for a, b, t in reference:
+            sampled_first.setdefault((a, b), t)
+
+        continuous = {}
+        for method in CONTINUOUS_METHODS:
+            violations = validate_swarm_trajectories(trajectories, drones, min_distance, method=method)
+            continuous[method] = {(a, b): t for a, b, t in violations}
+            errors += _check_continuous(label, method, continuous[method], sampled_first, trajectories,
+                                        min_distance)
+
+        # i metodi a tempo continuo devono coincidere tra loro
+        reference_method = CONTINUOUS_METHODS[0]
+        for method in CONTINUOUS_METHODS[1:]:
+            first, other = continuous[reference_method], continuous[method]
+            if set(first) != set(other):
+                errors.append(f"{label}: '{reference_method}' e '{method}' trovano coppie diverse "
+                              f"({len(first)} contro {len(other)})")
+                continue
+            gap = max((abs(first[pair] - other[pair]) for pair in first), default=0.0)
+            if gap > TIME_TOL:
+                errors.append(f"{label}: '{reference_method}' e '{method}' differiscono fino a {gap:.2e}s")
+
+        print(f"{label}: {len(sampled_first)} coppie campionate, "
+              f"{len(continuous[reference_method])} a tempo continuo", file=sys.stderr)
+
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Controlli di coerenza di assegnazione e controllo collisioni")
+    parser.add_argument("--perturbations", type=int, default=200)
+    parser.add_argument("--swarms", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    errors = check_incremental_assignment(args.perturbations, seed=args.seed)
+    print(f"riassegnazione incrementale: {args.perturbations} perturbazioni, {len(errors)} errori", file=sys.stderr)
+    errors += check_collision_methods(args.swarms, seed=args.seed)
+
+    for error in errors:
+        print(error)
+    print("OK" if not errors else f"{len(errors)} controlli falliti")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
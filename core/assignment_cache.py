@@ -0,0 +1,107 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+class AssignmentCache:
+    """
+    Cache su disco dei risultati di assegnazione, indirizzata per contenuto.
+
+    La chiave è l'hash SHA-256 di: posizioni di partenza, posizioni target e opzioni del solver.
+    Il valore è la permutazione col_ind (col_ind[i] = target del drone i) salvata come file .npy compatto.
+    Quando la cartella supera max_bytes vengono eliminati i file usati meno di recente (LRU sul mtime).
+    """
+
+    def __init__(self, cache_dir=".assignment_cache", max_bytes=64 * 1024 * 1024):
+        """
+        :param cache_dir: cartella dove salvare i file .npy
+        :param max_bytes: dimensione massima complessiva della cache in byte
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = int(max_bytes)
+
+        if self.max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+
+    @staticmethod
+    def make_key(drone_positions, target_positions, options=None):
+        """
+        Calcola la chiave della cache (stringa esadecimale).
+
+        Gli array vengono normalizzati a float64 contigui, così input equivalenti danno la stessa chiave.
+        """
+        digest = hashlib.sha256()
+        for array in (drone_positions, target_positions):
+            array = np.ascontiguousarray(array, dtype=np.float64)
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+        digest.update(repr(sorted((options or {}).items())).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        """
+        Ritorna la permutazione salvata per key, oppure None se non presente (o file illeggibile).
+        """
+        path = self._path(key)
+        try:
+            perm = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+        os.utime(path)      # aggiorna il mtime: il file diventa il più recente per l'LRU
+        return perm.astype(np.intp)
+
+    def put(self, key, perm):
+        """
+        Salva la permutazione con il tipo intero più piccolo sufficiente, poi applica l'eviction.
+        """
+        perm = np.asarray(perm)
+        dtype = np.uint16 if perm.size <= np.iinfo(np.uint16).max else np.uint32
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, perm.astype(dtype))
+        os.replace(tmp_path, self._path(key))   # scrittura atomica: nessun file .npy a metà
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Elimina i file meno usati di recente finché la cache non rientra in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Svuota la cache."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def __repr__(self):
+        return f"AssignmentCache(dir={self.cache_dir!r}, max_bytes={self.max_bytes})"
@@ -1,55 +1,852 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
 import numpy as np
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import maximum_bipartite_matching, min_weight_full_bipartite_matching
+from scipy.spatial import cKDTree
+
+from models.swarm import as_swarm
+from utils.geometry import segment_distances, synchronized_distances
+
+
+ASSIGNMENT_METHODS = ("dense", "sparse", "bottleneck", "partitioned")
+COST_METRICS = ("euclidean", "sqeuclidean")
 
+# numero massimo di punti campionati sui segmenti nella ricerca dei conflitti (oltre, il passo si allarga)
+MAX_CONFLICT_SAMPLES = 2_000_000
 
-def compute_cost_matrix(drone_positions, target_positions):
+
+def compute_cost_matrix(drone_positions, target_positions, dtype=np.float64, chunk_size=None, metric="euclidean"):
     """
     Calcola la matrice dei costi basata sulla distanza euclidea.
 
     :param drone_positions: array-like (N, 3)
     :param target_positions: array-like (N, 3)
+    :param dtype: tipo della matrice risultato (np.float64 di default, np.float32 dimezza la memoria)
+    :param chunk_size: se impostato, calcola la matrice a blocchi di chunk_size righe per limitare il picco di memoria
+    :param metric: 'euclidean' (distanza) o 'sqeuclidean' (distanza al quadrato: penalizza i percorsi lunghi
+        e con traiettorie rettilinee elimina molti incroci)
     :return: cost_matrix (N, N)
 
     Costruisce unamatrice cost_matrix di shape (N,N) dove l'elemento (i, j) è la distanza euclidea tra
     il drone i (posizione iniziale) e il target j (posizione della formazione).
+    Il calcolo è vettorizzato con broadcasting: niente doppio ciclo Python sulle N*N coppie.
     """
-    drone_positions = np.asarray(drone_positions, dtype=float)      # converte gli input in ndarray float
-    target_positions = np.asarray(target_positions, dtype=float)
+    dtype = np.dtype(dtype)
+    drone_positions = np.asarray(drone_positions, dtype=dtype)      # converte gli input in ndarray del tipo richiesto
+    target_positions = np.asarray(target_positions, dtype=dtype)
 
     if drone_positions.shape[0] != target_positions.shape[0]:
         raise ValueError("Number of drones and targets must be equal")
+    if chunk_size is not None and chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if metric not in COST_METRICS:
+        raise ValueError(f"Unknown cost metric '{metric}', expected one of {COST_METRICS}")
 
     N = drone_positions.shape[0]        # .shape[0] ti chiede quante righe ci sono -> cioè quanti droni hai
-    cost_matrix = np.zeros((N, N))
+    cost_matrix = np.empty((N, N), dtype=dtype)
 
-    for i in range(N):      # doppio ciclo: calcola la norma tra i due vettori 3D
-        for j in range(N):
-            cost_matrix[i, j] = np.linalg.norm(
-                drone_positions[i] - target_positions[j]
-            )
+    # senza chunk_size il blocco è l'intera matrice; altrimenti il temporaneo (rows, N, 3) resta limitato
+    step = N if chunk_size is None else int(chunk_size)
+    for start in range(0, N, max(step, 1)):
+        stop = min(start + step, N)
+        diff = drone_positions[start:stop, None, :] - target_positions[None, :, :]     # (rows, N, 3)
+        np.einsum('ijk,ijk->ij', diff, diff, out=cost_matrix[start:stop])
+        if metric == "euclidean":
+            np.sqrt(cost_matrix[start:stop], out=cost_matrix[start:stop])
 
     return cost_matrix
 
 
-def assign_drones_to_targets(drones, formation):
+def _solve_dense(drone_positions, target_positions, dtype=np.float64, chunk_size=None, metric="euclidean"):
+    """
+    Risolve il problema di assegnazione completo (Hungarian su matrice densa N x N).
+
+    :return: col_ind (N,) -> col_ind[i] è l'indice del target assegnato al drone i
+    """
+    cost_matrix = compute_cost_matrix(drone_positions, target_positions, dtype=dtype, chunk_size=chunk_size,
+                                      metric=metric)
+    row_ind, col_ind = linear_sum_assignment(cost_matrix)   # esegue l'Hungarian: row_id -> indici dei droni (riga) scelti; col_ind -> indici dei target (colonna) assegnati a quelle righe
+
+    perm = np.empty(len(row_ind), dtype=np.intp)
+    perm[row_ind] = col_ind
+    return perm
+
+
+def _knn_edges(drone_positions, target_positions, k):
+    """
+    Archi candidati del metodo sparso: drone -> k target più vicini e target -> k droni più vicini (KD-tree).
+
+    :return: (indici dei droni, indici dei target) senza ripetizioni
+    """
+    N = drone_positions.shape[0]
+    k = int(min(max(k, 1), N))
+    _, cols = cKDTree(target_positions).query(drone_positions, k=k)
+    _, rows = cKDTree(drone_positions).query(target_positions, k=k)
+    edge_rows = np.concatenate([np.repeat(np.arange(N), k), np.asarray(rows).ravel()])
+    edge_cols = np.concatenate([np.asarray(cols).ravel(), np.repeat(np.arange(N), k)])
+    keys = np.unique(edge_rows * N + edge_cols)
+    return keys // N, keys % N
+
+
+def _maximum_matching(edge_rows, edge_cols, N):
+    """Matching di cardinalità massima sul grafo sparso: target di ogni drone, -1 se il drone resta scoperto."""
+    graph = csr_matrix((np.ones(len(edge_rows)), (edge_rows, edge_cols)), shape=(N, N))
+    return maximum_bipartite_matching(graph, perm_type="column")
+
+
+def _solve_sparse(drone_positions, target_positions, k_nearest=16, metric="euclidean", retries=1):
+    """
+    Assegnazione sparsa: ogni drone considera solo i suoi k target più vicini e ogni target i suoi k droni
+    più vicini; il problema viene risolto come matching bipartito di peso minimo sul grafo sparso.
+
+    Se il grafo non ammette un matching perfetto (verifica rapida con un matching di cardinalità massima)
+    si riprova raddoppiando k, per al più retries volte. Se non basta (tipico di griglia a terra -> formazione
+    in quota, dove i vicini di tutti i droni sono gli stessi pochi target) il grafo del primo tentativo viene
+    completato: i droni e i target rimasti fuori dal matching massimo ricevono gli archi di un LAP denso
+    risolto solo tra loro e i loro k vicini reciproci, e il matching perfetto esiste sempre.
+
+    :param k_nearest: numero di candidati per drone (e di droni per target) al primo tentativo
+    :param retries: tentativi aggiuntivi con k raddoppiato prima di completare il grafo
+    :return: col_ind (N,) -> col_ind[i] è l'indice del target assegnato al drone i
+    """
+    drone_positions = np.asarray(drone_positions, dtype=float)
+    target_positions = np.asarray(target_positions, dtype=float)
+    N = drone_positions.shape[0]
+
+    k = int(min(max(k_nearest, 1), N))
+    edge_rows, edge_cols = first_rows, first_cols = _knn_edges(drone_positions, target_positions, k)
+    matching = first_matching = _maximum_matching(edge_rows, edge_cols, N)
+    for _ in range(retries):
+        if np.all(matching >= 0) or k >= N:
+            break
+        k = min(2 * k, N)
+        edge_rows, edge_cols = _knn_edges(drone_positions, target_positions, k)
+        matching = _maximum_matching(edge_rows, edge_cols, N)
+
+    if np.any(matching < 0):
+        # completamento del grafo del primo tentativo (più piccolo e più veloce da risolvere)
+        free_drones = np.flatnonzero(first_matching < 0)
+        free_targets = np.setdiff1d(np.arange(N), first_matching[first_matching >= 0])
+        local = _solve_dense(drone_positions[free_drones], target_positions[free_targets], metric=metric)
+        near_rows, near_cols = _knn_edges(drone_positions[free_drones], target_positions[free_targets], k_nearest)
+        edge_rows = np.concatenate([first_rows, free_drones, free_drones[near_rows]])
+        edge_cols = np.concatenate([first_cols, free_targets[local], free_targets[near_cols]])
+        keys = np.unique(edge_rows * N + edge_cols)
+        edge_rows, edge_cols = keys // N, keys % N
+
+    weights = np.linalg.norm(drone_positions[edge_rows] - target_positions[edge_cols], axis=1)
+    if metric == "sqeuclidean":
+        weights = weights ** 2
+
+    # lo scipy matching scarta i pesi nulli espliciti: si trasla tutto di una costante positiva,
+    # cosa che non cambia il matching ottimo perché ogni matching perfetto usa esattamente N archi
+    graph = csr_matrix((weights + 1.0, (edge_rows, edge_cols)), shape=(N, N))
+    row_ind, col_ind = min_weight_full_bipartite_matching(graph)
+
+    perm = np.empty(N, dtype=np.intp)
+    perm[row_ind] = col_ind
+    return perm
+
+
+def _rematch_below(cost_matrix, threshold, col4row):
+    """
+    Verifica se gli archi con costo <= threshold ammettono un matching perfetto, partendo (warm start) dal
+    matching perfetto col4row trovato con una soglia più alta: si tengono i suoi archi ancora ammessi e si
+    cercano cammini aumentanti (BFS vettorizzata a livelli) solo per i droni rimasti scoperti.
+
+    :return: nuovo col4row perfetto, oppure None se la soglia non ammette un matching perfetto
+    """
+    N = cost_matrix.shape[0]
+    col4row = np.where(cost_matrix[np.arange(N), col4row] <= threshold, col4row, -1)
+    row4col = np.full(N, -1, dtype=np.intp)
+    matched = np.flatnonzero(col4row >= 0)
+    row4col[col4row[matched]] = matched
+
+    for root in np.flatnonzero(col4row < 0):
+        parent = np.full(N, -1, dtype=np.intp)      # drone da cui è stato raggiunto ogni target
+        visited = np.zeros(N, dtype=bool)
+        frontier = np.array([root])
+        free = np.empty(0, dtype=np.intp)
+        while frontier.size and not free.size:
+            reach = (cost_matrix[frontier] <= threshold) & ~visited
+            cols = np.flatnonzero(reach.any(axis=0))
+            parent[cols] = frontier[reach[:, cols].argmax(axis=0)]
+            visited[cols] = True
+            free = cols[row4col[cols] < 0]
+            frontier = row4col[cols]
+        if not free.size:
+            # nessun cammino aumentante da root: nessun matching perfetto può coprirlo
+            return None
+
+        # inverte il cammino aumentante dal target libero fino a root
+        col = free[0]
+        while True:
+            row = parent[col]
+            col4row[row], row4col[col], col = col, row, col4row[row]
+            if row == root:
+                break
+    return col4row
+
+
+def _solve_bottleneck(drone_positions, target_positions, dtype=np.float64, chunk_size=None):
+    """
+    Assegnazione bottleneck: minimizza la distanza MASSIMA percorsa da un singolo drone.
+
+    La soglia ottima è compresa tra un limite inferiore (ogni drone e ogni target deve usare almeno il suo
+    arco più corto) e il massimo arco dell'assegnazione a distanza totale minima (LAP denso). La ricerca
+    binaria avviene solo sui costi in questo intervallo, provando prima il limite inferiore; ogni verifica
+    riparte dal matching dell'ultima soglia ammissibile (vedi _rematch_below).
+    A parità di distanza massima si sceglie l'assegnazione con distanza totale minima.
+
+    :return: col_ind (N,) -> col_ind[i] è l'indice del target assegnato al drone i
+    """
+    cost_matrix = compute_cost_matrix(drone_positions, target_positions, dtype=dtype, chunk_size=chunk_size)
+    N = cost_matrix.shape[0]
+    if N == 0:
+        return np.empty(0, dtype=np.intp)
+
+    row_ind, col_ind = linear_sum_assignment(cost_matrix)
+    best = np.empty(N, dtype=np.intp)
+    best[row_ind] = col_ind
+    upper_bound = cost_matrix[row_ind, col_ind].max()
+    lower_bound = max(cost_matrix.min(axis=1).max(), cost_matrix.min(axis=0).max())
+    edge_costs = np.unique(cost_matrix[(cost_matrix >= lower_bound) & (cost_matrix <= upper_bound)])
+
+    # best resta il matching perfetto della soglia ammissibile più bassa trovata finora
+    lo, hi = 0, len(edge_costs) - 1
+    if lo < hi:
+        # il limite inferiore è spesso già la soglia ottima: lo si prova per primo
+        matching = _rematch_below(cost_matrix, edge_costs[lo], best)
+        if matching is not None:
+            best, hi = matching, lo
+        else:
+            lo += 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        matching = _rematch_below(cost_matrix, edge_costs[mid], best)
+        if matching is not None:
+            best, hi = matching, mid
+        else:
+            lo = mid + 1
+    threshold = edge_costs[hi]
+    if threshold == upper_bound:
+        # il LAP denso rispetta già la soglia ed è il migliore per distanza totale
+        perm = np.empty(N, dtype=np.intp)
+        perm[row_ind] = col_ind
+        return perm
+
+    # tie-break: tra le assegnazioni con massimo <= threshold, minimizza la somma delle distanze
+    restricted = np.where(cost_matrix <= threshold, cost_matrix, np.inf)
+    row_ind, col_ind = linear_sum_assignment(restricted)
+
+    perm = np.empty(N, dtype=np.intp)
+    perm[row_ind] = col_ind
+    return perm
+
+
+def _balanced_cells(drone_positions, target_positions, cell_size):
+    """
+    Partiziona droni e target in celle spaziali bilanciate (bisezione ricorsiva per coordinate).
+
+    Ad ogni passo si divide lungo l'asse su cui sia droni che target sono più estesi (es. non Z se i droni
+    sono tutti a terra): metà dei droni (ordinati lungo l'asse) e metà dei target vanno in ciascuna
+    sottocella, quindi ogni cella ha tanti droni quanti target.
+
+    :return: lista di coppie (indici_droni, indici_target)
+    """
+    N = drone_positions.shape[0]
+    stack = [(np.arange(N), np.arange(N))]
+    cells = []
+
+    while stack:
+        drone_idx, target_idx = stack.pop()
+        n = len(drone_idx)
+        if n <= cell_size:
+            cells.append((drone_idx, target_idx))
+            continue
+
+        spread = np.minimum(np.ptp(drone_positions[drone_idx], axis=0), np.ptp(target_positions[target_idx], axis=0))
+        axis = int(np.argmax(spread))
+        half = n // 2
+
+        drone_order = drone_idx[np.argsort(drone_positions[drone_idx, axis], kind="stable")]
+        target_order = target_idx[np.argsort(target_positions[target_idx, axis], kind="stable")]
+        stack.append((drone_order[:half], target_order[:half]))
+        stack.append((drone_order[half:], target_order[half:]))
+
+    return cells
+
+
+def _solve_cell(cell):
+    """
+    Worker (deve essere a livello di modulo per il ProcessPoolExecutor): risolve il LAP denso di una cella.
+
+    :param cell: tupla (drone_positions, target_positions, metric) della cella
+    :return: permutazione locale
+    """
+    drone_positions, target_positions, metric = cell
+    return _solve_dense(drone_positions, target_positions, metric=metric)
+
+
+def _solve_partitioned(drone_positions, target_positions, cell_size=1000, max_workers=None, repair_fraction=0.1,
+                       metric="euclidean", mp_context=None):
+    """
+    Assegnazione gerarchica per sciami molto grandi.
+
+    1) Divide droni e target in celle spaziali bilanciate di al più cell_size elementi.
+    2) Risolve il LAP di ogni cella in parallelo su più processi.
+    3) Ripara i confini: i droni con le distanze assegnate più lunghe (frazione repair_fraction)
+       vengono riassegnati tra loro con un piccolo LAP globale. Questo passo non peggiora mai il costo totale,
+       perché l'assegnazione corrente di quei droni è una delle soluzioni ammissibili.
+
+    I worker ricevono solo i dati delle celle (_solve_cell è a livello di modulo): funzionano con qualsiasi
+    metodo di avvio dei processi.
+
+    :param mp_context: contesto multiprocessing o nome del metodo di avvio ('spawn', 'forkserver', 'fork');
+                       None = default della piattaforma
+    :return: col_ind (N,) -> col_ind[i] è l'indice del target assegnato al drone i
+    """
+    N = drone_positions.shape[0]
+    if cell_size < 2:
+        raise ValueError("cell_size must be >= 2")
+    if N <= cell_size:
+        return _solve_dense(drone_positions, target_positions, metric=metric)
+
+    cells = _balanced_cells(drone_positions, target_positions, cell_size)
+    payload = [(drone_positions[d_idx], target_positions[t_idx], metric) for d_idx, t_idx in cells]
+
+    if max_workers == 1:
+        local_perms = [_solve_cell(cell) for cell in payload]
+    else:
+        context = multiprocessing.get_context(mp_context) if isinstance(mp_context, str) else mp_context
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            local_perms = list(executor.map(_solve_cell, payload))
+
+    perm = np.empty(N, dtype=np.intp)
+    for (drone_idx, target_idx), local in zip(cells, local_perms):
+        perm[drone_idx] = target_idx[local]
+
+    # passata globale di riparazione sui droni peggiori (tipicamente quelli a cavallo dei confini tra celle)
+    n_repair = int(np.ceil(repair_fraction * N))
+    if n_repair >= 2:
+        distances = np.linalg.norm(drone_positions - target_positions[perm], axis=1)
+        rows = np.argpartition(distances, N - n_repair)[N - n_repair:]
+        cols = perm[rows]
+        local = _solve_dense(drone_positions[rows], target_positions[cols], metric=metric)
+        perm[rows] = cols[local]
+
+    return perm
+
+
+def segment_conflict_pairs(starts, ends, min_distance):
+    """
+    Coppie di droni i cui segmenti rettilinei start -> end passano a meno di min_distance.
+
+    I candidati vengono selezionati con un KD-tree su punti campionati lungo ogni segmento (raggio pari a
+    min_distance più il passo di campionamento, indipendente dalla lunghezza dei segmenti), poi la distanza
+    esatta segmento-segmento viene calcolata in modo vettorizzato solo sui candidati.
+
+    :param starts: array (N, 3) punti di partenza
+    :param ends: array (N, 3) punti di arrivo
+    :param min_distance: distanza minima ammessa
+    :return: array (M, 2) di indici (i, j) con i < j
+    """
+    return _conflict_pairs(starts, ends, min_distance, segment_distances)
+
+
+def path_conflict_pairs(starts, ends, min_distance):
+    """
+    Coppie di droni che, partendo insieme su traiettorie rettilinee minimum jerk della stessa durata,
+    si avvicinano a meno di min_distance (distanza sincronizzata, vedi synchronized_distances).
+
+    :return: array (M, 2) di indici (i, j) con i < j
+    """
+    return _conflict_pairs(starts, ends, min_distance, synchronized_distances)
+
+
+def _segment_candidate_pairs(starts, ends, min_distance):
+    """
+    Broad phase per segmento: ogni segmento viene campionato con passo spacing e si cercano con un KD-tree
+    i campioni di segmenti diversi a distanza <= min_distance + spacing. Se due segmenti passano a meno di
+    min_distance, i loro punti più vicini distano al più spacing / 2 da un campione: la coppia viene trovata.
+    Il raggio non dipende dalla lunghezza dei segmenti, quindi un percorso lungo non rende candidate tutte le coppie.
+
+    :return: array (M, 2) di indici (i, j) con i < j, senza ripetizioni
+    """
+    N = len(starts)
+    lengths = np.linalg.norm(ends - starts, axis=1)
+    spacing = max(min_distance, lengths.sum() / MAX_CONFLICT_SAMPLES, 1e-9)
+
+    # campioni equispaziati su ogni segmento, estremi inclusi
+    counts = np.ceil(lengths / spacing).astype(np.intp) + 1
+    owner = np.repeat(np.arange(N), counts)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    fraction = offsets / np.maximum(counts[owner] - 1, 1)
+    samples = starts[owner] + fraction[:, None] * (ends[owner] - starts[owner])
+
+    sample_pairs = cKDTree(samples).query_pairs(r=min_distance + spacing, output_type="ndarray")
+    if len(sample_pairs) == 0:
+        return np.empty((0, 2), dtype=np.intp)
+
+    i, j = owner[sample_pairs[:, 0]], owner[sample_pairs[:, 1]]
+    keys = np.unique(np.minimum(i, j) * N + np.maximum(i, j))
+    pairs = np.stack([keys // N, keys % N], axis=1)
+    return pairs[pairs[:, 0] != pairs[:, 1]]
+
+
+def _conflict_pairs(starts, ends, min_distance, distance_kernel):
+    """
+    Selezione dei candidati con la broad phase per segmento + verifica esatta vettorizzata con distance_kernel.
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    if len(starts) < 2:
+        return np.empty((0, 2), dtype=np.intp)
+
+    pairs = _segment_candidate_pairs(starts, ends, min_distance)
+    if len(pairs) == 0:
+        return np.empty((0, 2), dtype=np.intp)
+
+    # filtro economico sui punti medi prima del kernel esatto
+    midpoints = 0.5 * (starts + ends)
+    half_lengths = 0.5 * np.linalg.norm(ends - starts, axis=1)
+    i, j = pairs[:, 0], pairs[:, 1]
+    reach = half_lengths[i] + half_lengths[j] + min_distance
+    keep = np.linalg.norm(midpoints[i] - midpoints[j], axis=1) <= reach
+    pairs = pairs[keep]
+
+    i, j = pairs[:, 0], pairs[:, 1]
+    close = distance_kernel(starts[i], ends[i], starts[j], ends[j]) < min_distance
+    pairs = pairs[close]
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def refine_assignment_swaps(drone_positions, target_positions, perm, min_distance=0.5,
+                            max_distance_increase=0.05, max_passes=5):
+    """
+    Raffinamento locale dopo il LAP: scambia i target di coppie di droni in conflitto.
+
+    Ad ogni passata si cercano le coppie i cui percorsi sincronizzati passano a meno di min_distance
+    (candidati via KD-tree, verifica vettorizzata); per ogni coppia si prova a scambiare i target e lo scambio
+    viene accettato se riduce i conflitti dei due droni senza superare la distanza massima iniziale
+    di oltre max_distance_increase (frazione relativa).
+
+    :param drone_positions: array (N, 3)
+    :param target_positions: array (N, 3)
+    :param perm: col_ind (N,) assegnazione di partenza
+    :return: nuova col_ind (N,)
+    """
+    drone_positions = np.asarray(drone_positions, dtype=float)
+    target_positions = np.asarray(target_positions, dtype=float)
+    perm = np.array(perm, dtype=np.intp)
+    if len(perm) < 2:
+        return perm
+
+    ends = target_positions[perm]
+    distance_limit = np.linalg.norm(ends - drone_positions, axis=1).max() * (1.0 + max_distance_increase)
+
+    def conflicts_of(i):
+        # conflitti del drone i con tutti gli altri (vettorizzato su N)
+        close = synchronized_distances(drone_positions[i], ends[i], drone_positions, ends) < min_distance
+        close[i] = False
+        return close
+
+    for _ in range(max_passes):
+        pairs = path_conflict_pairs(drone_positions, ends, min_distance)
+        if len(pairs) == 0:
+            break
+
+        improved = False
+        for i, j in pairs:
+            conflicts_i, conflicts_j = conflicts_of(i), conflicts_of(j)
+            if not conflicts_i[j]:
+                continue    # già risolto da uno scambio precedente in questa passata
+            before = conflicts_i.sum() + conflicts_j.sum() - 1
+
+            ends[[i, j]] = ends[[j, i]]
+            conflicts_i, conflicts_j = conflicts_of(i), conflicts_of(j)
+            after = conflicts_i.sum() + conflicts_j.sum() - int(conflicts_i[j])
+            longest = max(np.linalg.norm(ends[i] - drone_positions[i]), np.linalg.norm(ends[j] - drone_positions[j]))
+
+            if after < before and longest <= distance_limit:
+                perm[[i, j]] = perm[[j, i]]
+                improved = True
+            else:
+                ends[[i, j]] = ends[[j, i]]     # scambio rifiutato
+
+        if not improved:
+            break
+
+    return perm
+
+
+def _penalize_conflicts(drone_positions, target_positions, perm, min_distance, conflict_penalty,
+                        penalty_rounds=3, metric="euclidean", max_cost=None):
+    """
+    Post-pass anti-conflitto: penalizza gli archi assegnati i cui segmenti passano a meno di min_distance
+    da un altro segmento e risolve di nuovo il LAP ristretto ai droni in conflitto e ai loro target,
+    per al più penalty_rounds volte.
+
+    La penalità è relativa: conflict_penalty moltiplica, per ogni drone in conflitto, la differenza di costo tra
+    la migliore alternativa (tra i target dei droni in conflitto) e l'arco assegnato; con 1.0 l'arco assegnato
+    costa quanto l'alternativa. Le penalità si accumulano tra i round. Ci si ferma al primo round che non
+    riduce i conflitti (la sua assegnazione viene scartata).
+
+    :param max_cost: se impostato, il LAP ristretto non usa archi di costo maggiore (es. soglia del bottleneck)
+    :return: col_ind (N,)
+    """
+    current = np.array(perm, dtype=np.intp)
+    pairs = segment_conflict_pairs(drone_positions, target_positions[current], min_distance)
+    penalties = {}      # (drone, target) -> penalità accumulata
+
+    for _ in range(penalty_rounds):
+        if len(pairs) == 0:
+            break
+
+        rows = np.unique(pairs)
+        cols = current[rows]
+        sub = compute_cost_matrix(drone_positions[rows], target_positions[cols], metric=metric)
+        if max_cost is not None:
+            sub[(sub > max_cost) & ~np.eye(len(rows), dtype=bool)] = np.inf   # gli archi assegnati restano ammessi
+
+        assigned = np.diag(sub).copy()
+        alternatives = sub + np.diag(np.full(len(rows), np.inf))
+        gap = np.maximum(alternatives.min(axis=1) - assigned, 0.0)
+        gap[~np.isfinite(gap)] = 0.0
+        for i, j, g in zip(rows.tolist(), cols.tolist(), gap.tolist()):
+            penalties[(i, j)] = penalties.get((i, j), 0.0) + conflict_penalty * max(g, 1e-9)
+
+        row_pos = {i: k for k, i in enumerate(rows.tolist())}
+        col_pos = {j: k for k, j in enumerate(cols.tolist())}
+        for (i, j), value in penalties.items():
+            if i in row_pos and j in col_pos:
+                sub[row_pos[i], col_pos[j]] += value
+
+        row_ind, col_ind = linear_sum_assignment(sub)
+        candidate = current.copy()
+        candidate[rows[row_ind]] = cols[col_ind]
+
+        candidate_pairs = segment_conflict_pairs(drone_positions, target_positions[candidate], min_distance)
+        if len(candidate_pairs) >= len(pairs):
+            break
+        current, pairs = candidate, candidate_pairs
+
+    return current
+
+
+def solve_assignment(drone_positions, target_positions, method="dense", k_nearest=16,
+                     dtype=np.float64, chunk_size=None, cell_size=1000, max_workers=None, repair_fraction=0.1,
+                     metric="euclidean", conflict_penalty=None, min_distance=0.5, penalty_rounds=3,
+                     refine_swaps=False, max_distance_increase=0.05, refine_passes=5, mp_context=None):
+    """
+    Calcola la permutazione ottima drone -> target.
+
+    :param drone_positions: array-like (N, 3)
+    :param target_positions: array-like (N, 3)
+    :param method: 'dense' (Hungarian su matrice N x N), 'sparse' (solo i k target più vicini per drone),
+        'bottleneck' (minimizza la distanza massima, poi la totale) o 'partitioned' (celle spaziali in parallelo)
+    :param k_nearest: numero di candidati per drone (e di droni per target) nel metodo 'sparse'
+    :param dtype: tipo della matrice dei costi nei metodi 'dense' e 'bottleneck'
+    :param chunk_size: righe per blocco nella costruzione della matrice dei costi
+    :param cell_size: numero massimo di droni per cella nel metodo 'partitioned'
+    :param max_workers: processi usati dal metodo 'partitioned' (None = tutti i core, 1 = sequenziale)
+    :param repair_fraction: frazione di droni ripassati nel LAP globale di riparazione ('partitioned')
+    :param mp_context: contesto multiprocessing o nome del metodo di avvio dei worker ('partitioned');
+        None = default della piattaforma
+    :param metric: costo degli archi, 'euclidean' o 'sqeuclidean' (il bottleneck usa sempre la distanza)
+    :param conflict_penalty: se impostato (tutti i metodi), penalità relativa degli archi i cui segmenti passano a meno
+        di min_distance da un altro segmento (multiplo della differenza di costo con la migliore alternativa);
+        il LAP ristretto ai droni in conflitto viene risolto di nuovo per al più penalty_rounds volte
+        (con 'bottleneck' senza superare la distanza massima trovata)
+    :param min_distance: distanza minima usata dal post-pass anti-conflitto e dal raffinamento a scambi
+    :param penalty_rounds: numero massimo di round del post-pass anti-conflitto
+    :param refine_swaps: se True, applica refine_assignment_swaps al risultato (tutti i metodi)
+    :param max_distance_increase: aumento relativo massimo della distanza massima ammesso dagli scambi
+    :param refine_passes: numero massimo di passate del raffinamento a scambi
+    :return: col_ind (N,) -> col_ind[i] è l'indice del target assegnato al drone i
+
+    Con 'sparse', se il grafo dei k vicini non ammette un matching perfetto neanche raddoppiando k_nearest,
+    viene completato con un LAP denso tra i soli droni e target rimasti scoperti (vedi _solve_sparse).
+    """
+    drone_positions = np.asarray(drone_positions, dtype=float)
+    target_positions = np.asarray(target_positions, dtype=float)
+
+    if drone_positions.shape[0] != target_positions.shape[0]:
+        raise ValueError("Number of drones and targets must be equal")
+    if method not in ASSIGNMENT_METHODS:
+        raise ValueError(f"Unknown assignment method '{method}', expected one of {ASSIGNMENT_METHODS}")
+
+    perm = None
+    if method == "sparse":
+        perm = _solve_sparse(drone_positions, target_positions, k_nearest=k_nearest, metric=metric)
+    elif method == "bottleneck":
+        perm = _solve_bottleneck(drone_positions, target_positions, dtype=dtype, chunk_size=chunk_size)
+    elif method == "partitioned":
+        perm = _solve_partitioned(drone_positions, target_positions, cell_size=cell_size,
+                                  max_workers=max_workers, repair_fraction=repair_fraction, metric=metric,
+                                  mp_context=mp_context)
+
+    if perm is None:
+        perm = _solve_dense(drone_positions, target_positions, dtype=dtype, chunk_size=chunk_size, metric=metric)
+
+    if conflict_penalty:
+        if method == "bottleneck":
+            # il post-pass non deve superare la distanza massima ottima
+            max_cost = np.linalg.norm(target_positions[perm] - drone_positions, axis=1).max(initial=0.0)
+            perm = _penalize_conflicts(drone_positions, target_positions, perm, min_distance, conflict_penalty,
+                                       penalty_rounds=penalty_rounds, max_cost=max_cost)
+        else:
+            perm = _penalize_conflicts(drone_positions, target_positions, perm, min_distance, conflict_penalty,
+                                       penalty_rounds=penalty_rounds, metric=metric)
+
+    if refine_swaps:
+        perm = refine_assignment_swaps(drone_positions, target_positions, perm, min_distance=min_distance,
+                                       max_distance_increase=max_distance_increase, max_passes=refine_passes)
+    return perm
+
+
+@dataclass
+class AssignmentState:
+    """
+    Soluzione del problema di assegnazione insieme alle variabili duali (potenziali di riga e colonna).
+
+    Con costi ridotti c_ij - u_i - v_j >= 0 ovunque e nulli sugli archi assegnati, la soluzione è ottima:
+    conservare u e v permette di riparare la soluzione quando cambiano pochi droni o target.
+    """
+    col_ind: np.ndarray             # (N,) target assegnato a ciascun drone
+    u: np.ndarray                   # (N,) duali di riga (droni)
+    v: np.ndarray                   # (N,) duali di colonna (target)
+    drone_positions: np.ndarray     # (N, 3) posizioni usate per il calcolo
+    target_positions: np.ndarray    # (N, 3)
+
+
+def _duals_from_assignment(cost_matrix, col_ind, k_nearest=16, tol=1e-9):
+    """
+    Ricostruisce duali ammissibili (u, v) per un'assegnazione ottima già nota.
+
+    I duali sono cammini minimi sul grafo alternante: v_j <= v_col(i) + c_ij - c_i,col(i), con
+    u_i = c_i,col(i) - v_col(i). Il rilassamento (label correcting, partenza da u = 0) usa solo archi candidati,
+    all'inizio i k_nearest archi più economici di ogni riga, quindi ogni passata costa O(N k) invece di O(N^2).
+    Al punto fisso una verifica O(N^2) sull'intera matrice aggiunge gli archi ancora violati e si ripete:
+    di solito bastano poche verifiche. Per un'assegnazione ottima non esistono cicli negativi e il
+    rilassamento converge.
+    """
+    N = cost_matrix.shape[0]
+    rows = np.arange(N)
+    matched = cost_matrix[rows, col_ind]
+
+    k = min(k_nearest, N)
+    cheapest = np.argpartition(cost_matrix, k - 1, axis=1)[:, :k] if N else np.empty((0, 0), dtype=np.intp)
+    edge_rows, edge_cols = np.repeat(rows, k), cheapest.ravel()
+
+    v = np.empty(N, dtype=float)
+    v[col_ind] = matched        # partenza con u = 0
+    while True:
+        edge_costs = cost_matrix[edge_rows, edge_cols]
+        for _ in range(max(N, 1)):
+            u = matched - v[col_ind]
+            new_v = v.copy()
+            np.minimum.at(new_v, edge_cols, edge_costs - u[edge_rows])
+            converged = np.all(new_v >= v - tol)
+            v = new_v
+            if converged:
+                break
+
+        # verifica su tutti gli archi: quelli violati entrano tra i candidati
+        u = matched - v[col_ind]
+        violated_rows, violated_cols = np.nonzero(cost_matrix - u[:, None] - v < -tol)
+        if len(violated_rows) == 0:
+            return u, v
+        edge_rows = np.concatenate([edge_rows, violated_rows])
+        edge_cols = np.concatenate([edge_cols, violated_cols])
+
+
+def _cost_row(drone_position, target_positions):
+    """Riga i della matrice dei costi: distanze del drone i da tutti i target."""
+    return np.linalg.norm(target_positions - drone_position, axis=1)
+
+
+def _augment_from_row(drone_positions, target_positions, u, v, col4row, row4col, cur_row):
+    """
+    Cammino aumentante minimo (Dijkstra sui costi ridotti) a partire dalla riga libera cur_row,
+    come nello schema shortest augmenting path di Jonker-Volgenant.
+    Aggiorna in place duali e assegnazione; le righe dei costi vengono calcolate solo quando servono.
+    """
+    N = len(v)
+    shortest = np.full(N, np.inf)
+    path = np.full(N, -1, dtype=np.intp)
+    scanned_cols = np.zeros(N, dtype=bool)
+    scanned_rows = []
+
+    min_val = 0.0
+    i = cur_row
+    sink = -1
+    while sink < 0:
+        scanned_rows.append(i)
+        reduced = min_val + _cost_row(drone_positions[i], target_positions) - u[i] - v
+        better = ~scanned_cols & (reduced < shortest)
+        shortest[better] = reduced[better]
+        path[better] = i
+
+        candidates = np.where(scanned_cols, np.inf, shortest)
+        lowest = candidates.min()
+        if not np.isfinite(lowest):
+            raise ValueError("Cost matrix is infeasible")
+
+        # a parità di costo si preferisce una colonna libera: il cammino termina prima
+        ties = (candidates == lowest) & (row4col < 0)
+        j = int(np.argmax(ties)) if ties.any() else int(np.argmin(candidates))
+
+        min_val = lowest
+        scanned_cols[j] = True
+        if row4col[j] < 0:
+            sink = j
+        else:
+            i = row4col[j]
+
+    # aggiornamento dei duali
+    u[cur_row] += min_val
+    other_rows = np.asarray(scanned_rows[1:], dtype=np.intp)
+    if len(other_rows):
+        u[other_rows] += min_val - shortest[col4row[other_rows]]
+    v[scanned_cols] -= min_val - shortest[scanned_cols]
+
+    # inversione del cammino aumentante
+    j = sink
+    while True:
+        i = path[j]
+        row4col[j] = i
+        col4row[i], j = j, col4row[i]
+        if i == cur_row:
+            break
+
+
+def solve_assignment_with_duals(drone_positions, target_positions, dtype=np.float64, chunk_size=None):
+    """
+    Risolve il problema denso e ritorna un AssignmentState riutilizzabile per riassegnazioni incrementali.
+
+    :param drone_positions: array-like (N, 3)
+    :param target_positions: array-like (N, 3)
+    :return: AssignmentState
+    """
+    drone_positions = np.array(drone_positions, dtype=float)
+    target_positions = np.array(target_positions, dtype=float)
+
+    cost_matrix = compute_cost_matrix(drone_positions, target_positions, dtype=dtype, chunk_size=chunk_size)
+    row_ind, col_ind = linear_sum_assignment(cost_matrix)
+    perm = np.empty(len(row_ind), dtype=np.intp)
+    perm[row_ind] = col_ind
+
+    u, v = _duals_from_assignment(np.asarray(cost_matrix, dtype=float), perm)
+    return AssignmentState(perm, u, v, drone_positions, target_positions)
+
+
+def reassign_incremental(state, drone_positions, target_positions, atol=1e-9):
+    """
+    Ripara una soluzione precedente quando cambiano solo alcuni droni (righe) o target (colonne).
+
+    Per ogni riga/colonna modificata si libera l'assegnazione, si ripristina l'ammissibilità dei duali
+    e si esegue un cammino aumentante per ogni drone rimasto libero: il costo è proporzionale al numero
+    di modifiche, non alla dimensione dello sciame.
+
+    :param state: AssignmentState della soluzione precedente
+    :param drone_positions: array-like (N, 3) nuove posizioni di partenza
+    :param target_positions: array-like (N, 3) nuovi target
+    :param atol: tolleranza per considerare invariata una posizione
+    :return: nuovo AssignmentState (state non viene modificato)
+    """
+    drone_positions = np.array(drone_positions, dtype=float)
+    target_positions = np.array(target_positions, dtype=float)
+    N = drone_positions.shape[0]
+
+    if target_positions.shape[0] != N:
+        raise ValueError("Number of drones and targets must be equal")
+    if state.drone_positions.shape != drone_positions.shape or state.target_positions.shape != target_positions.shape:
+        return solve_assignment_with_duals(drone_positions, target_positions)   # dimensioni cambiate: si riparte da zero
+
+    col4row = state.col_ind.astype(np.intp).copy()
+    row4col = np.empty(N, dtype=np.intp)
+    row4col[col4row] = np.arange(N)
+    u = state.u.astype(float).copy()
+    v = state.v.astype(float).copy()
+
+    changed_rows = np.flatnonzero(np.any(np.abs(drone_positions - state.drone_positions) > atol, axis=1))
+    changed_cols = np.flatnonzero(np.any(np.abs(target_positions - state.target_positions) > atol, axis=1))
+
+    # righe modificate: si liberano e si riporta u_i al massimo valore ammissibile
+    for i in changed_rows:
+        row4col[col4row[i]] = -1
+        col4row[i] = -1
+        u[i] = np.min(_cost_row(drone_positions[i], target_positions) - v)
+
+    # colonne modificate: si liberano e si riporta v_j al massimo valore ammissibile
+    for j in changed_cols:
+        if row4col[j] >= 0:
+            col4row[row4col[j]] = -1
+            row4col[j] = -1
+        v[j] = np.min(np.linalg.norm(drone_positions - target_positions[j], axis=1) - u)
+
+    for i in np.flatnonzero(col4row < 0):
+        _augment_from_row(drone_positions, target_positions, u, v, col4row, row4col, int(i))
+
+    return AssignmentState(col4row, u, v, drone_positions, target_positions)
+
+
+def assign_drones_to_targets_incremental(drones, formation, previous_state=None):
+    """
+    Come assign_drones_to_targets (metodo 'dense'), ma riusa la soluzione precedente se disponibile.
+    Non usa la AssignmentCache su disco: lo stato da riparare resta in memoria (previous_state).
+
+    :param drones: lista di oggetti Drone o Swarm
+    :param formation: oggetto Formation
+    :param previous_state: AssignmentState dello stesso step calcolato in precedenza (o None)
+    :return: (dict {drone_id: target_position}, AssignmentState)
+    """
+    swarm = as_swarm(drones)
+    drone_positions = swarm.positions
+    target_positions = formation.target_positions
+
+    if previous_state is None:
+        state = solve_assignment_with_duals(drone_positions, target_positions)
+    else:
+        state = reassign_incremental(previous_state, drone_positions, target_positions)
+
+    assignment = dict(zip(swarm.drone_ids.tolist(), target_positions[state.col_ind]))
+    return assignment, state
+
+
+def assign_drones_to_targets(drones, formation, method="dense", cache=None, **options):
     """
     Assegna ogni drone a una posizione target della formazione.
 
-    :param drones: lista di oggetti Drone
+    :param drones: lista di oggetti Drone o Swarm
     :param formation: oggetto Formation
+    :param method: solver da usare, vedi solve_assignment ('dense', 'sparse', 'bottleneck' o 'partitioned')
+    :param cache: AssignmentCache opzionale; se il problema è già stato risolto il solver non viene chiamato
+    :param options: opzioni aggiuntive del solver (es. k_nearest, dtype, chunk_size)
     :return: dict {drone_id: target_position}
     """
-    drone_positions = np.array([d.initial_position for d in drones])    # estrae le posizioni iniziali di tutti i droni e i punti target dalla Formation
+    swarm = as_swarm(drones)
+    drone_positions = swarm.positions   # posizioni iniziali di tutti i droni (array contiguo dello Swarm) e punti target dalla Formation
     target_positions = formation.target_positions
 
-    cost_matrix = compute_cost_matrix(drone_positions, target_positions)
-
-    row_ind, col_ind = linear_sum_assignment(cost_matrix)   # esegue l'Hungarian: row_id -> indici dei droni (riga) scelti; col_ind -> indici dei target (colonna) assegnati a quelle righe
+    col_ind = None
+    if cache is not None:
+        key = cache.make_key(drone_positions, target_positions, dict(options, method=method))
+        col_ind = cache.get(key)
+        if col_ind is not None and col_ind.shape != (len(drones),):
+            col_ind = None      # file incoerente con il problema: si ricalcola
 
-    assignment = {}
-    for i, j in zip(row_ind, col_ind):
-        assignment[drones[i].drone_id] = target_positions[j]
+    if col_ind is None:
+        col_ind = solve_assignment(drone_positions, target_positions, method=method, **options)
+        if cache is not None:
+            cache.put(key, col_ind)
 
+    assignment = dict(zip(swarm.drone_ids.tolist(), target_positions[col_ind]))     # drone_id -> target
     return assignment
 
 
@@ -57,5 +854,11 @@ def assign_drones_to_targets(drones, formation):
 Il mio solver:
     -Costruisce la matrice delle distanze
     -Usa Hungarian per minimizzare la distanza totale
+    -Per sciami molto grandi può lavorare su un grafo sparso dei k target più vicini
+    -In modalità bottleneck minimizza la distanza del drone più lontano (= durata della transizione)
+    -Il costo può essere la distanza o la distanza al quadrato (meno incroci), con penalità opzionale sui conflitti
+    -Può raffinare l'assegnazione scambiando i target delle coppie di droni i cui percorsi si avvicinano troppo
+    -Per 5k+ droni può dividere lo spazio in celle bilanciate risolte in parallelo su più core
+    -Conservando i duali può riparare la soluzione quando cambiano pochi target (riassegnazione incrementale)
     -Ritorna una mappatura drone -> target
 """
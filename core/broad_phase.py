@@ -0,0 +1,186 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils.math_tools import bernstein_coefficients, compose_affine
+
+
+# memoria massima (byte) della costruzione dei bounding box per blocco di droni
+BOX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def close_pairs(positions, min_distance):
+    """
+    Coppie di droni a distanza strettamente minore di min_distance in un singolo istante (broad phase con
+    KD-tree: si esaminano solo i vicini, non tutte le N(N-1)/2 coppie).
+
+    :param positions: array (N, 3)
+    :return: (indici i, indici j) con i < j, ordinati per (i, j)
+    """
+    pairs = cKDTree(positions).query_pairs(r=min_distance, output_type='ndarray')
+    if len(pairs) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    # query_pairs include anche le coppie a distanza esattamente r: filtro stretto come nel controllo a coppie
+    pair_i, pair_j = pairs[:, 0], pairs[:, 1]
+    close = np.linalg.norm(positions[pair_i] - positions[pair_j], axis=-1) < min_distance
+    pair_i, pair_j = pair_i[close], pair_j[close]
+
+    order = np.lexsort((pair_j, pair_i))
+    return pair_i[order], pair_j[order]
+
+
+def broad_phase_violations(block_positions, min_distance):
+    """
+    Come il kernel a coppie del validatore, ma con un KD-tree per ogni istante del blocco.
+
+    :param block_positions: array (B, N, 3) posizioni di tutti i droni in B istanti
+    :return: (indici dei tempi nel blocco, indici i, indici j), ordinati per tempo e poi per coppia (i, j)
+    """
+    time_idx, all_i, all_j = [], [], []
+    for k, positions in enumerate(block_positions):
+        pair_i, pair_j = close_pairs(positions, min_distance)
+        time_idx.append(np.full(len(pair_i), k, dtype=int))
+        all_i.append(pair_i)
+        all_j.append(pair_j)
+
+    if not time_idx:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty
+    return np.concatenate(time_idx), np.concatenate(all_i), np.concatenate(all_j)
+
+
+def _window_pieces(breakpoints, coefficients, window_edges):
+    """
+    Segmenti di ogni drone ristretti a ogni finestra temporale, per blocchi di droni (entro BOX_BLOCK_BYTES).
+    Ogni parte è riferita a s in [0, 1] sull'intersezione tra segmento e finestra.
+
+    :return: generatore di (slice dei droni, parti (B, W, S, 3, K), maschera inside (B, W, S)
+             delle intersezioni non vuote, durata delle intersezioni (B, W, S))
+    """
+    N, S, _, K = coefficients.shape
+    window_starts, window_ends = window_edges[:-1, None], window_edges[1:, None]    # (W, 1)
+    block_size = max(1, BOX_BLOCK_BYTES // (len(window_starts) * S * 3 * K * K * 8))
+
+    for start in range(0, N, block_size):
+        block = slice(start, start + block_size)
+        bp = breakpoints[block, None, :]                           # (B, 1, S + 1)
+        seg_start, seg_end = bp[..., :-1], bp[..., 1:]
+
+        # parte di ogni segmento dentro ogni finestra: tau = alpha + beta * s
+        lo = np.maximum(window_starts, seg_start)                  # (B, W, S)
+        hi = np.minimum(window_ends, seg_end)
+        inside = hi > lo
+        span = np.where(inside, hi - lo, 0.0)
+        length = np.where(seg_end > seg_start, seg_end - seg_start, 1.0)
+
+        pieces = compose_affine(coefficients[block, None], ((lo - seg_start) / length)[..., None],
+                                (span / length)[..., None])
+        yield block, pieces, inside, span
+
+
+def window_bounding_boxes(breakpoints, coefficients, window_edges):
+    """
+    Bounding box allineati agli assi (AABB) di ogni drone su ogni finestra temporale, in forma analitica:
+    ogni segmento polinomiale viene riferito alla sua parte dentro la finestra e racchiuso tra il minimo e
+    il massimo dei suoi coefficienti di Bernstein (la traiettoria non può uscire dal box, nemmeno tra due campioni).
+
+    :param breakpoints: array (N, S + 1) breakpoints globali (da closest_approach.stack_pieces)
+    :param coefficients: array (N, S, 3, K)
+    :param window_edges: array (W + 1,) istanti crescenti di inizio/fine delle finestre
+    :return: (lower (N, W, 3), upper (N, W, 3))
+    """
+    N, W = len(breakpoints), len(window_edges) - 1
+    lower = np.empty((N, W, 3))
+    upper = np.empty((N, W, 3))
+
+    for block, pieces, inside, _ in _window_pieces(breakpoints, coefficients, window_edges):
+        control_points = bernstein_coefficients(pieces)            # (B, W, S, 3, K)
+        lower[block] = np.min(np.where(inside[..., None], control_points.min(axis=-1), np.inf), axis=2)
+        upper[block] = np.max(np.where(inside[..., None], control_points.max(axis=-1), -np.inf), axis=2)
+
+    return lower, upper
+
+
+def window_speed_bounds(breakpoints, coefficients, window_edges):
+    """
+    Limite superiore della velocità di ogni drone su ogni finestra temporale, in forma analitica:
+    ogni componente della velocità è limitata dal massimo modulo dei coefficienti di Bernstein della derivata
+    della parte di segmento nella finestra.
+
+    :param breakpoints: array (N, S + 1) breakpoints globali (da closest_approach.stack_pieces)
+    :param coefficients: array (N, S, 3, K)
+    :param window_edges: array (W + 1,) istanti crescenti di inizio/fine delle finestre
+    :return: array (N, W) [m/s]
+    """
+    N, W = len(breakpoints), len(window_edges) - 1
+    K = coefficients.shape[3]
+    speeds = np.zeros((N, W))
+    if K < 2:
+        return speeds
+
+    for block, pieces, inside, span in _window_pieces(breakpoints, coefficients, window_edges):
+        # d/dt = (1 / durata dell'intersezione) d/ds
+        derivative = pieces[..., 1:] * np.arange(1, K)
+        axis_bounds = np.max(np.abs(bernstein_coefficients(derivative)), axis=-1)      # (B, W, S, 3)
+        bound = np.linalg.norm(axis_bounds, axis=-1) / np.where(inside, span, 1.0)
+        speeds[block] = np.max(np.where(inside, bound, 0.0), axis=2)
+
+    return speeds
+
+
+def sweep_and_prune(lower, upper):
+    """
+    Coppie di box sovrapposti (sweep and prune): i box vengono ordinati per estremo inferiore lungo x e ognuno
+    viene confrontato solo con quelli che iniziano prima della sua fine lungo x; poi si controllano y e z.
+
+    :param lower: array (N, 3)
+    :param upper: array (N, 3)
+    :return: (indici i, indici j) con i < j, ordinati per (i, j)
+    """
+    N = len(lower)
+    order = np.argsort(lower[:, 0], kind='stable')
+    sorted_lower = lower[order, 0]
+
+    # box successivi nell'ordinamento che iniziano entro la fine (lungo x) del box corrente
+    ends = np.searchsorted(sorted_lower, upper[order, 0], side='right')
+    counts = np.maximum(ends - np.arange(N) - 1, 0)
+    first = np.repeat(np.arange(N), counts)
+    offsets = np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+    box_a, box_b = order[first], order[first + 1 + offsets]
+
+    overlap = np.all((lower[box_a] <= upper[box_b]) & (lower[box_b] <= upper[box_a]), axis=1)
+    box_a, box_b = box_a[overlap], box_b[overlap]
+
+    pair_i, pair_j = np.minimum(box_a, box_b), np.maximum(box_a, box_b)
+    order = np.lexsort((pair_j, pair_i))
+    return pair_i[order], pair_j[order]
+
+
+def culled_pairs(breakpoints, coefficients, min_distance, window_edges):
+    """
+    Coppie di droni che POSSONO avvicinarsi a meno di min_distance in ogni finestra temporale:
+    box analitici per finestra gonfiati di min_distance / 2 per lato, poi sweep and prune finestra per finestra.
+    Le coppie escluse non scendono mai sotto min_distance nella finestra.
+
+    :param breakpoints: array (N, S + 1) segmenti dei droni da closest_approach.stack_pieces,
+                        che devono coprire tutte le finestre
+    :param coefficients: array (N, S, 3, K)
+    :param window_edges: array (W + 1,) istanti di inizio/fine delle finestre
+    :return: (indici delle finestre, indici i, indici j), ordinati per finestra e poi per coppia (i, j)
+    """
+    window_edges = np.asarray(window_edges, dtype=float)
+    lower, upper = window_bounding_boxes(breakpoints, coefficients, window_edges)
+    lower -= 0.5 * min_distance
+    upper += 0.5 * min_distance
+
+    window_idx, all_i, all_j = [], [], []
+    for w in range(len(window_edges) - 1):
+        pair_i, pair_j = sweep_and_prune(lower[:, w], upper[:, w])
+        window_idx.append(np.full(len(pair_i), w, dtype=int))
+        all_i.append(pair_i)
+        all_j.append(pair_j)
+
+    if not window_idx:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty
+    return np.concatenate(window_idx), np.concatenate(all_i), np.concatenate(all_j)
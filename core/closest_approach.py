@@ -0,0 +1,348 @@
+
+"""
+Controllo ESATTO (a tempo continuo) della distanza minima tra traiettorie polinomiali.
+
+Su un intervallo in cui entrambi i droni seguono un solo segmento polinomiale, la differenza di posizione
+d(s) è un polinomio e la distanza al quadrato q(s) = |d(s)|^2 è anch'essa un polinomio (di grado doppio).
+Il minimo di q si trova tra gli estremi dell'intervallo e le radici di q', il primo istante di violazione
+tra le radici di q - min_distance^2: nessun campionamento, quindi nessun avvicinamento perso tra due campioni.
+
+I polinomi q di tutte le coppie sono costruiti in forma vettorizzata, per blocchi di coppie; le radici si
+cercano solo negli intervalli in cui il limite inferiore di Bernstein di q scende sotto la soglia.
+"""
+
+import numpy as np
+
+from models.piecewise_trajectory import PiecewiseTrajectory
+from utils.math_tools import bernstein_coefficients, compose_affine, polyval_normalized
+
+
+# tolleranze della ricerca delle radici in [0, 1]
+ROOT_IMAG_TOL = 1e-7
+ROOT_INTERVAL_TOL = 1e-9
+
+# numero di coppie elaborate insieme nella costruzione vettorizzata dei polinomi
+PAIR_BLOCK_SIZE = 4096
+
+# sottointervalli su cui si ricalcolano i limiti di Bernstein prima di cercare le radici
+BERNSTEIN_SUBDIVISIONS = 8
+
+
+def polynomial_pieces(traj):
+    """
+    Segmenti polinomiali di una traiettoria: (breakpoints locali (S + 1,), coefficienti (S, 3, K)).
+    """
+    if isinstance(traj, PiecewiseTrajectory):
+        return traj.breakpoints, traj.coefficients
+
+    coefficients = getattr(traj, 'coefficients', None)
+    if coefficients is None:
+        raise ValueError("Only polynomial trajectories can be checked exactly")
+    return np.array([0.0, traj.duration]), np.asarray(coefficients, dtype=float)[None]
+
+
+def global_pieces(traj, t_end):
+    """
+    Segmenti della traiettoria sul tempo globale, da 0 (o da start_time se negativo) ad almeno t_end,
+    inclusi i tratti da fermo prima della partenza e dopo l'arrivo.
+
+    :return: (breakpoints globali (S + 1,), coefficienti (S, 3, K))
+    """
+    local_breakpoints, coefficients = polynomial_pieces(traj)
+    start = traj.start_time
+    end = start + traj.duration
+    K = coefficients.shape[2]
+
+    hold_start = np.zeros((1, 3, K))
+    hold_start[0, :, 0] = traj.position(start)
+    hold_end = np.zeros((1, 3, K))
+    hold_end[0, :, 0] = traj.position(end)
+
+    breakpoints = np.concatenate([[min(0.0, start)], start + local_breakpoints, [max(end, t_end)]])
+    return breakpoints, np.concatenate([hold_start, coefficients, hold_end])
+
+
+def stack_pieces(trajectories, t_end):
+    """
+    Segmenti globali di più droni allineati allo stesso numero di segmenti e allo stesso grado
+    (i segmenti aggiunti hanno lunghezza nulla e non vengono mai selezionati).
+
+    :param trajectories: sequenza di N traiettorie polinomiali
+    :return: (breakpoints (N, S + 1), coefficienti (N, S, 3, K))
+    """
+    pieces = [global_pieces(traj, t_end) for traj in trajectories]
+    S = max(len(coefficients) for _, coefficients in pieces)
+    K = max(coefficients.shape[2] for _, coefficients in pieces)
+
+    breakpoints = np.zeros((len(pieces), S + 1))
+    stacked = np.zeros((len(pieces), S, 3, K))
+    for i, (bp, coefficients) in enumerate(pieces):
+        s = len(coefficients)
+        breakpoints[i, :s + 1] = bp
+        breakpoints[i, s + 1:] = bp[-1]
+        stacked[i, :s, :, :coefficients.shape[2]] = coefficients
+        stacked[i, s:] = stacked[i, s - 1]
+
+    return breakpoints, stacked
+
+
+def evaluate_pieces(breakpoints, coefficients, times):
+    """
+    Posizioni di droni ai tempi globali times, direttamente sui segmenti allineati da stack_pieces.
+
+    :param breakpoints: array (N, S + 1)
+    :param coefficients: array (N, S, 3, K)
+    :param times: array broadcastabile con breakpoints[:, 0], compreso tra il primo e l'ultimo breakpoint
+                  (es. (T, 1) per tutti i droni a T tempi, (N,) per un tempo diverso per ogni drone)
+    :return: array (..., 3) con la shape del broadcast tra times e breakpoints[:, 0]
+    """
+    times = np.asarray(times, dtype=float)
+    shape = np.broadcast_shapes(times.shape, breakpoints.shape[:1])
+    S = coefficients.shape[1]
+
+    seg = np.clip(np.sum(times[..., None] >= breakpoints, axis=-1) - 1, 0, S - 1)
+    seg = np.broadcast_to(seg, shape)
+    bp = np.broadcast_to(breakpoints, shape + (S + 1,))
+    seg_start = np.take_along_axis(bp, seg[..., None], axis=-1)[..., 0]
+    length = np.take_along_axis(bp, seg[..., None] + 1, axis=-1)[..., 0] - seg_start
+    tau = np.clip((times - seg_start) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+
+    pieces = np.take_along_axis(np.broadcast_to(coefficients, shape + coefficients.shape[1:]),
+                                seg[..., None, None, None], axis=-3)[..., 0, :, :]       # (..., 3, K)
+    return polyval_normalized(pieces, tau[..., None])
+
+
+def _squared_distance_polynomials(breakpoints_a, coefficients_a, breakpoints_b, coefficients_b, t_end, t_start=0.0):
+    """
+    Distanza al quadrato tra i droni di P coppie come polinomio a tratti su [t_start, t_end].
+
+    :param breakpoints_a: (P, S + 1) breakpoints globali del primo drone di ogni coppia (da stack_pieces)
+    :param coefficients_a: (P, S, 3, K)
+    :param t_end: fine dell'intervallo, scalare o (P,) (una per coppia)
+    :param t_start: inizio dell'intervallo, scalare o (P,)
+    :return: (inizi (P, M), fini (P, M), coefficienti (P, M, 2K - 1) in potenze crescenti di s in [0, 1]);
+             gli intervalli di lunghezza nulla (fine == inizio) vanno ignorati
+    """
+    P = len(breakpoints_a)
+
+    # intervalli su cui entrambi i droni restano su un solo segmento: unione ordinata dei breakpoints
+    t_start = np.broadcast_to(np.asarray(t_start, dtype=float), (P,))[:, None]
+    t_end = np.broadcast_to(np.asarray(t_end, dtype=float), (P,))[:, None]
+    breaks = np.sort(np.concatenate([t_start, t_end, np.clip(breakpoints_a, t_start, t_end),
+                                     np.clip(breakpoints_b, t_start, t_end)], axis=1), axis=1)
+    starts, ends = breaks[:, :-1], breaks[:, 1:]
+    mid = 0.5 * (starts + ends)
+    rows = np.arange(P)[:, None]
+
+    def on_intervals(breakpoints, coefficients):
+        # segmento attivo a metà intervallo, riferito a s: tau = alpha + beta * s
+        seg = np.clip(np.sum(mid[:, :, None] >= breakpoints[:, None, :], axis=2) - 1, 0, coefficients.shape[1] - 1)
+        seg_start = breakpoints[rows, seg]
+        length = breakpoints[rows, seg + 1] - seg_start
+        length = np.where(length > 0, length, 1.0)
+        alpha = (starts - seg_start) / length
+        beta = (ends - starts) / length
+        return compose_affine(coefficients[rows, seg], alpha[..., None], beta[..., None])     # (P, M, 3, K)
+
+    diff = on_intervals(breakpoints_a, coefficients_a) - on_intervals(breakpoints_b, coefficients_b)
+
+    # |d(s)|^2: prodotto di polinomi (convoluzione dei coefficienti) sommato sugli assi
+    K = diff.shape[-1]
+    squared = np.zeros(diff.shape[:2] + (2 * K - 1,))
+    for k in range(K):
+        squared[..., k:k + K] += np.einsum('pma,pmak->pmk', diff[..., k], diff)
+    return starts, ends, squared
+
+
+def _roots_in_unit_interval(coeffs):
+    """Radici reali in [0, 1] del polinomio (potenze crescenti), ordinate."""
+    coeffs = np.asarray(coeffs, dtype=float)
+    scale = np.max(np.abs(coeffs))
+    if scale == 0.0:
+        return np.zeros(0)
+
+    # i coefficienti di testa trascurabili renderebbero mal condizionata la matrice compagna
+    nonzero = np.flatnonzero(np.abs(coeffs) > 1e-12 * scale)
+    coeffs = coeffs[:nonzero[-1] + 1]
+    if len(coeffs) < 2:
+        return np.zeros(0)
+
+    roots = np.polynomial.polynomial.polyroots(coeffs)
+    roots = roots.real[np.abs(roots.imag) <= ROOT_IMAG_TOL]
+    roots = roots[(roots >= -ROOT_INTERVAL_TOL) & (roots <= 1.0 + ROOT_INTERVAL_TOL)]
+    return np.sort(np.clip(roots, 0.0, 1.0))
+
+
+def _interval_minimum(squared):
+    """Minimo di q(s) su [0, 1]: (q minimo, s del minimo)."""
+    derivative = squared[1:] * np.arange(1, len(squared))
+    candidates = np.concatenate([[0.0, 1.0], _roots_in_unit_interval(derivative)])
+    values = polyval_normalized(squared, candidates)
+    k = np.argmin(values)
+    return values[k], candidates[k]
+
+
+def _interval_first_violation(squared, threshold):
+    """
+    Primo s in [0, 1] da cui q(s) < threshold, o None.
+    Fra due radici consecutive di q - threshold (o gli estremi) q - threshold non cambia segno,
+    quindi basta controllarne il valore nei punti e a metà tra due punti consecutivi.
+    """
+    if squared[0] < threshold:
+        return 0.0
+
+    shifted = squared.copy()
+    shifted[0] -= threshold
+    points = np.unique(np.concatenate([[0.0, 1.0], _roots_in_unit_interval(shifted)]))
+
+    values = polyval_normalized(squared, points)
+    mids = polyval_normalized(squared, 0.5 * (points[:-1] + points[1:]))
+    below = np.flatnonzero((values[:-1] < threshold) | (mids < threshold))
+    if len(below):
+        return float(points[below[0]])
+    return 1.0 if values[-1] < threshold else None
+
+
+def _may_violate(squared, threshold):
+    """
+    Intervalli in cui q(s) PUÒ scendere sotto threshold, secondo i limiti inferiori di Bernstein
+    (prima sull'intero intervallo, poi, per i soli intervalli rimasti, su BERNSTEIN_SUBDIVISIONS sottointervalli,
+    che danno limiti più stretti). Gli intervalli scartati non hanno certamente violazioni.
+
+    :param squared: array (..., 2K - 1)
+    :return: maschera booleana (...)
+    """
+    candidates = np.min(bernstein_coefficients(squared), axis=-1) < threshold
+    index = np.nonzero(candidates)
+
+    subdivision_starts = np.arange(BERNSTEIN_SUBDIVISIONS) / BERNSTEIN_SUBDIVISIONS
+    pieces = compose_affine(squared[index][:, None], subdivision_starts, 1.0 / BERNSTEIN_SUBDIVISIONS)
+    candidates[index] = np.any(np.min(bernstein_coefficients(pieces), axis=-1) < threshold, axis=1)
+    return candidates
+
+
+def first_violations(starts, ends, squared, min_distance):
+    """
+    Primo istante in cui la distanza scende sotto min_distance, per ogni coppia (polinomi da
+    _squared_distance_polynomials). Le radici si cercano solo negli intervalli che _may_violate non scarta.
+
+    :return: array (P,) di istanti globali (nan se la coppia non viola mai)
+    """
+    threshold = min_distance ** 2
+    candidates = (ends > starts) & _may_violate(squared, threshold)
+    result = np.full(len(starts), np.nan)
+
+    for p in np.flatnonzero(np.any(candidates, axis=1)):
+        # intervalli candidati della coppia, in ordine di tempo: il primo con una violazione la determina
+        for m in np.flatnonzero(candidates[p]):
+            s = _interval_first_violation(squared[p, m], threshold)
+            if s is not None:
+                result[p] = starts[p, m] + s * (ends[p, m] - starts[p, m])
+                break
+    return result
+
+
+def first_violations_between(breakpoints_a, coefficients_a, breakpoints_b, coefficients_b, t_start, t_end,
+                             min_distance):
+    """
+    Primo istante di violazione di P coppie, ognuna sul proprio intervallo [t_start, t_end]
+    (segmenti allineati da stack_pieces, già selezionati per coppia).
+
+    :param t_start: array (P,) o scalare
+    :param t_end: array (P,) o scalare
+    :return: array (P,) di istanti globali (nan se la coppia non viola nell'intervallo)
+    """
+    starts, ends, squared = _squared_distance_polynomials(breakpoints_a, coefficients_a,
+                                                          breakpoints_b, coefficients_b, t_end, t_start)
+    return first_violations(starts, ends, squared, min_distance)
+
+
+def _pair_blocks(trajectories, pairs, block_size=PAIR_BLOCK_SIZE):
+    """
+    Polinomi della distanza al quadrato per blocchi di coppie.
+
+    :param pairs: coppie (drone_id_i, drone_id_j) (default: tutte le coppie i<j)
+    :return: generatore di (coppie del blocco, inizi (P, M), fini (P, M), polinomi (P, M, 2K - 1))
+    """
+    drone_ids = list(trajectories.keys())
+    index = {did: i for i, did in enumerate(drone_ids)}
+    if pairs is None:
+        pair_i, pair_j = np.triu_indices(len(drone_ids), k=1)
+        pairs = [(drone_ids[i], drone_ids[j]) for i, j in zip(pair_i.tolist(), pair_j.tolist())]
+    else:
+        pairs = list(pairs)
+        pair_i = np.array([index[a] for a, _ in pairs], dtype=int)
+        pair_j = np.array([index[b] for _, b in pairs], dtype=int)
+
+    t_end = max(traj.start_time + traj.duration for traj in trajectories.values())
+    breakpoints, coefficients = stack_pieces([trajectories[did] for did in drone_ids], t_end)
+
+    for start in range(0, len(pairs), block_size):
+        i, j = pair_i[start:start + block_size], pair_j[start:start + block_size]
+        starts, ends, squared = _squared_distance_polynomials(breakpoints[i], coefficients[i],
+                                                              breakpoints[j], coefficients[j], t_end)
+        yield pairs[start:start + block_size], starts, ends, squared
+
+
+def closest_approaches(trajectories, min_distance=0.0, pairs=None):
+    """
+    Distanza minima esatta per ogni coppia candidata dello sciame, sul tempo globale da 0 alla fine
+    dell'ultima traiettoria, tenendo conto degli start_time.
+
+    :param trajectories: dict {drone_id: traiettoria polinomiale} (Trajectory con coefficienti o PiecewiseTrajectory)
+    :param min_distance: soglia per il primo istante di violazione (distanza < min_distance)
+    :param pairs: coppie (drone_id_i, drone_id_j) da controllare (default: tutte le coppie i<j)
+    :return: dict {(drone_id_i, drone_id_j): {'min_distance', 'time' (istante del minimo),
+             'first_violation' (None se la distanza non scende mai sotto min_distance)}}
+    """
+    threshold = min_distance ** 2
+    results = {}
+
+    for block_pairs, starts, ends, squared in _pair_blocks(trajectories, pairs):
+        for pair, pair_starts, pair_ends, pair_squared in zip(block_pairs, starts, ends, squared):
+            best_value, best_time, first_violation = np.inf, 0.0, None
+
+            for start, end, q in zip(pair_starts, pair_ends, pair_squared):
+                if end <= start:
+                    continue
+                value, s = _interval_minimum(q)
+                if value < best_value:
+                    best_value, best_time = value, start + s * (end - start)
+                if first_violation is None and value < threshold:
+                    s = _interval_first_violation(q, threshold)
+                    if s is not None:
+                        first_violation = float(start + s * (end - start))
+
+            results[pair] = {"min_distance": float(np.sqrt(max(best_value, 0.0))),
+                             "time": float(best_time),
+                             "first_violation": first_violation}
+    return results
+
+
+def closest_approach(traj_a, traj_b, min_distance=0.0):
+    """
+    Distanza minima esatta tra due traiettorie polinomiali (vedi closest_approaches).
+
+    :return: dict con 'min_distance', 'time' e 'first_violation'
+    """
+    return closest_approaches({0: traj_a, 1: traj_b}, min_distance)[(0, 1)]
+
+
+def exact_swarm_violations(trajectories, min_distance=0.5, pairs=None):
+    """
+    Violazioni della distanza minima a tempo continuo: una per coppia, al primo istante in cui la distanza
+    scende sotto min_distance. Gli intervalli in cui i limiti inferiori di Bernstein della distanza al
+    quadrato non scendono sotto la soglia vengono scartati senza cercare radici.
+
+    :param pairs: coppie (drone_id_i, drone_id_j) candidate (default: tutte le coppie i<j)
+    :return: lista [(drone_id1, drone_id2, t), ...] ordinata per tempo
+    """
+    violations = []
+
+    for block_pairs, starts, ends, squared in _pair_blocks(trajectories, pairs):
+        times = first_violations(starts, ends, squared, min_distance)
+        violations.extend((block_pairs[p][0], block_pairs[p][1], float(times[p]))
+                          for p in np.flatnonzero(~np.isnan(times)))
+
+    violations.sort(key=lambda v: v[2])
+    return violations
@@ -0,0 +1,107 @@
+
+"""
+Controllo di distanza con passo adattivo (conservative advancement).
+
+Per ogni coppia candidata si avanza nel tempo di un passo pari al margine di separazione diviso per il limite
+superiore della velocità relativa:
+    passo = (|p_i(t) - p_j(t)| - min_distance) / (v_max_i + v_max_j)
+In quel passo la distanza non può scendere sotto min_distance, quindi i periodi sicuri si attraversano con
+passi lunghi e il passo si accorcia solo quando i droni si avvicinano. Quando il passo scende sotto dt_min
+(droni quasi a contatto) il resto della finestra viene controllato con la ricerca esatta delle radici
+(core.closest_approach) invece di avanzare a piccoli passi: nessuna violazione può sfuggire, anche radente,
+e l'istante riportato è il primo istante di violazione vero. I limiti di velocità sono analitici e
+valgono per finestra temporale (core.broad_phase.window_speed_bounds); nelle finestre in cui i bounding box
+della coppia non si sovrappongono la coppia salta direttamente alla finestra successiva.
+"""
+
+import numpy as np
+
+from core.broad_phase import culled_pairs, window_speed_bounds
+from core.closest_approach import evaluate_pieces, first_violations_between, stack_pieces
+
+
+# durata [s] delle finestre su cui valgono i limiti di velocità
+ADVANCEMENT_WINDOW_DURATION = 0.5
+
+# passo [s] sotto il quale si passa alla ricerca esatta sul resto della finestra
+ADVANCEMENT_DT_MIN = 0.01
+
+
+def adaptive_swarm_violations(trajectories, min_distance=0.5, dt_min=ADVANCEMENT_DT_MIN,
+                              window_duration=ADVANCEMENT_WINDOW_DURATION):
+    """
+    Violazioni della distanza minima con passo adattivo: una per coppia, al primo istante in cui la distanza
+    scende sotto min_distance.
+
+    dt_min non limita la garanzia ma solo il costo: sotto dt_min il resto della finestra della coppia viene
+    risolto in forma esatta, sopra il passo conservativo non può saltare una violazione.
+
+    :param trajectories: dict {drone_id: traiettoria polinomiale} (Trajectory con coefficienti o PiecewiseTrajectory)
+    :param dt_min: passo [s] sotto il quale si usa la ricerca esatta
+    :param window_duration: durata [s] delle finestre dei limiti di velocità e dei bounding box
+    :return: lista [(drone_id1, drone_id2, t), ...] ordinata per tempo e poi per coppia
+    """
+    if dt_min <= 0:
+        raise ValueError("dt_min must be positive")
+
+    drone_ids = list(trajectories.keys())
+    N = len(drone_ids)
+    T_end = max(trajectories[did].start_time + trajectories[did].duration for did in drone_ids)
+
+    window_edges = np.append(np.arange(0.0, T_end, window_duration), T_end)
+    W = len(window_edges) - 1
+    breakpoints, coefficients = stack_pieces([trajectories[did] for did in drone_ids], T_end)
+    speeds = window_speed_bounds(breakpoints, coefficients, window_edges)        # (N, W)
+
+    # coppie candidate e, per ognuna, le finestre in cui i bounding box si sovrappongono
+    window_idx, cand_i, cand_j = culled_pairs(breakpoints, coefficients, min_distance, window_edges)
+    pair_keys, pair_idx = np.unique(cand_i * N + cand_j, return_inverse=True)
+    pair_i, pair_j = pair_keys // N, pair_keys % N
+    active_windows = np.zeros((len(pair_keys), W), dtype=bool)
+    active_windows[pair_idx, window_idx] = True
+
+    t = np.zeros(len(pair_keys))
+    first_violation = np.full(len(pair_keys), np.nan)
+    pending = np.arange(len(pair_keys))
+
+    while len(pending):
+        t_now = t[pending]
+        w = np.clip(np.searchsorted(window_edges, t_now, side='right') - 1, 0, W - 1)
+        window_end = window_edges[w + 1]
+        checked = active_windows[pending, w]
+
+        # coppie da controllare: distanza attuale e passo conservativo (entro la fine della finestra)
+        p = pending[checked]
+        i, j = pair_i[p], pair_j[p]
+        separation = np.linalg.norm(evaluate_pieces(breakpoints[i], coefficients[i], t[p]) -
+                                    evaluate_pieces(breakpoints[j], coefficients[j], t[p]), axis=-1)
+        margin = separation - min_distance
+        violated = margin < 0
+        first_violation[p[violated]] = t[p[violated]]
+
+        relative_speed = speeds[i, w[checked]] + speeds[j, w[checked]]
+        step = np.divide(margin, relative_speed, out=np.full(len(p), np.inf), where=relative_speed > 0)
+        t[p] = np.minimum(t[p] + step, window_end[checked])
+
+        # droni quasi a contatto: ricerca esatta sul resto della finestra invece di passi sempre più corti
+        exact = ~violated & (step < dt_min)
+        if np.any(exact):
+            q, qi, qj = p[exact], i[exact], j[exact]
+            times = first_violations_between(breakpoints[qi], coefficients[qi], breakpoints[qj], coefficients[qj],
+                                             t_now[checked][exact], window_end[checked][exact], min_distance)
+            found = ~np.isnan(times)
+            first_violation[q[found]] = times[found]
+            violated[np.flatnonzero(exact)[found]] = True
+            t[q] = window_end[checked][exact]
+
+        # coppie con bounding box separati nella finestra: salto alla finestra successiva
+        t[pending[~checked]] = window_end[~checked]
+
+        # una coppia termina alla prima violazione o dopo il controllo della fine dell'orizzonte
+        done = t_now >= T_end
+        done[checked] |= violated
+        pending = pending[~done]
+
+    violations = np.flatnonzero(~np.isnan(first_violation))
+    order = violations[np.lexsort((pair_j[violations], pair_i[violations], first_violation[violations]))]
+    return [(drone_ids[pair_i[k]], drone_ids[pair_j[k]], float(first_violation[k])) for k in order.tolist()]
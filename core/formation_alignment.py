@@ -0,0 +1,139 @@
+import numpy as np
+
+from core.assignment_solver import solve_assignment
+from core.formation_generator import transform_formation
+from utils.geometry import rotation_matrix_z
+
+
+def _pose_targets(target_positions, center, yaw, offset):
+    """Ruota i target di yaw attorno all'asse Z passante per center, poi li trasla di offset."""
+    R = rotation_matrix_z(yaw)
+    return (target_positions - center) @ R.T + center + offset
+
+
+def _clamp_offset(offset, max_offset):
+    """Limita la norma dello spostamento a max_offset."""
+    norm = np.linalg.norm(offset)
+    if norm > max_offset:
+        return offset * (max_offset / norm)
+    return offset
+
+
+def _assignment_cost(start_positions, posed_targets, assignment_options):
+    """Costo totale (somma delle distanze) dell'assegnazione ottima verso i target nella posa corrente."""
+    perm = solve_assignment(start_positions, posed_targets, **assignment_options)
+    return float(np.linalg.norm(posed_targets[perm] - start_positions, axis=1).sum()), perm
+
+
+def yaw_candidate_scores(start_positions, target_positions, yaws, offset=None, max_points=256, seed=0):
+    """
+    Valuta in un'unica passata vettorizzata una batch di angoli di yaw candidati.
+
+    Il punteggio è la distanza di Chamfer simmetrica tra droni e target ruotati (media delle distanze dal
+    punto più vicino in entrambe le direzioni): non richiede di risolvere un'assegnazione per ogni angolo.
+    Per sciami grandi si usa un sottoinsieme di max_points punti.
+
+    :param start_positions: array (N, 3)
+    :param target_positions: array (N, 3)
+    :param yaws: array (K,) di angoli [rad]
+    :param offset: traslazione (3,) già applicata ai target (default nessuna)
+    :return: array (K,) dei punteggi (più basso = migliore)
+    """
+    start_positions = np.asarray(start_positions, dtype=float)
+    target_positions = np.asarray(target_positions, dtype=float)
+    yaws = np.asarray(yaws, dtype=float)
+    offset = np.zeros(3) if offset is None else np.asarray(offset, dtype=float)
+
+    N = start_positions.shape[0]
+    if N > max_points:
+        rng = np.random.default_rng(seed)
+        start_positions = start_positions[rng.choice(N, max_points, replace=False)]
+        target_positions = target_positions[rng.choice(N, max_points, replace=False)]
+
+    center = target_positions.mean(axis=0)
+    c, s = np.cos(yaws), np.sin(yaws)
+    R = np.zeros((len(yaws), 3, 3))
+    R[:, 0, 0], R[:, 0, 1] = c, -s
+    R[:, 1, 0], R[:, 1, 1] = s, c
+    R[:, 2, 2] = 1.0
+
+    posed = np.einsum('kab,nb->kna', R, target_positions - center) + center + offset     # (K, M, 3)
+    dist = np.linalg.norm(posed[:, :, None, :] - start_positions[None, None, :, :], axis=-1)   # (K, M, M)
+    return dist.min(axis=2).mean(axis=1) + dist.min(axis=1).mean(axis=1)
+
+
+def align_formation(formation, start_positions, max_offset=1.0, max_yaw=np.pi, yaw_candidates=36,
+                    iterations=5, top_candidates=3, assignment_options=None):
+    """
+    Cerca la posa (yaw attorno a Z + traslazione) della prossima formazione che minimizza lo spostamento
+    dei droni dalle posizioni correnti.
+
+    1) Valuta una batch di yaw candidati in un'unica passata vettorizzata (utile per forme simmetriche
+       come cerchio, stella o sfera) e risolve l'assegnazione solo per i migliori top_candidates.
+    2) Alterna (stile ICP) assegnazione e fit rigido di Procrustes (yaw + traslazione) finché il costo scende.
+
+    La traslazione rispetto alla posizione originale è limitata a max_offset e lo yaw a [-max_yaw, max_yaw].
+
+    :param formation: oggetto Formation da allineare
+    :param start_positions: array (N, 3) posizioni correnti dei droni
+    :param max_offset: spostamento massimo ammesso del centro della formazione [m]
+    :param max_yaw: rotazione massima ammessa attorno a Z [rad]
+    :param yaw_candidates: numero di yaw valutati nella ricerca iniziale (1 = solo yaw nullo)
+    :param iterations: numero massimo di iterazioni assegnazione / Procrustes
+    :param top_candidates: numero di yaw migliori su cui risolvere l'assegnazione vera
+    :param assignment_options: opzioni passate a solve_assignment
+    :return: (Formation allineata, dict con 'yaw', 'offset', 'cost', 'initial_cost')
+    """
+    assignment_options = dict(assignment_options or {})
+    start_positions = np.asarray(start_positions, dtype=float)
+    targets = formation.target_positions
+    center = targets.mean(axis=0)
+
+    # costo della posa originale: l'allineamento non deve mai peggiorarlo
+    best_yaw, best_offset = 0.0, np.zeros(3)
+    initial_cost, best_perm = _assignment_cost(start_positions, targets, assignment_options)
+    best_cost = initial_cost
+
+    # 1) ricerca vettorizzata sugli yaw candidati
+    if yaw_candidates > 1 and max_yaw > 0:
+        offset0 = _clamp_offset(start_positions.mean(axis=0) - center, max_offset)
+        yaws = np.linspace(-max_yaw, max_yaw, yaw_candidates, endpoint=not np.isclose(max_yaw, np.pi))
+        scores = yaw_candidate_scores(start_positions, targets, yaws, offset=offset0)
+        for yaw in yaws[np.argsort(scores)[:top_candidates]]:
+            cost, perm = _assignment_cost(start_positions, _pose_targets(targets, center, yaw, offset0),
+                                          assignment_options)
+            if cost < best_cost:
+                best_yaw, best_offset, best_cost, best_perm = float(yaw), offset0, cost, perm
+
+    # 2) alternanza assegnazione / Procrustes (yaw attorno a Z + traslazione)
+    yaw, offset, perm = best_yaw, best_offset, best_perm
+    for _ in range(iterations):
+        p = targets[perm] - center          # target assegnati, centrati (posa originale)
+        q = start_positions - center        # droni, nello stesso riferimento
+        p_mean, q_mean = p.mean(axis=0), q.mean(axis=0)
+        pc, qc = p - p_mean, q - q_mean
+
+        yaw = float(np.arctan2(np.sum(pc[:, 0] * qc[:, 1] - pc[:, 1] * qc[:, 0]),
+                               np.sum(pc[:, 0] * qc[:, 0] + pc[:, 1] * qc[:, 1])))
+        yaw = float(np.clip(yaw, -max_yaw, max_yaw))
+        offset = _clamp_offset(q_mean - rotation_matrix_z(yaw) @ p_mean, max_offset)
+
+        cost, perm = _assignment_cost(start_positions, _pose_targets(targets, center, yaw, offset),
+                                      assignment_options)
+        if cost >= best_cost - 1e-9:
+            break
+        best_yaw, best_offset, best_cost, best_perm = yaw, offset, cost, perm
+
+    # rotazione attorno a center espressa come rotazione attorno all'origine + traslazione
+    R = rotation_matrix_z(best_yaw)
+    aligned = transform_formation(formation,
+                                  translation_vec=center - R @ center + best_offset,
+                                  rotation_angle_z=best_yaw)
+
+    info = {
+        "yaw": best_yaw,
+        "offset": best_offset,
+        "cost": best_cost,
+        "initial_cost": initial_cost,
+    }
+    return aligned, info
@@ -1,24 +1,192 @@
+import numpy as np
+
 from models.trajectory import Trajectory
-from utils.math_tools import minimum_jerk_3d
+from models.piecewise_trajectory import PiecewiseTrajectory
+from models.swarm import as_swarm as to_swarm     # alias: generate_trajectories ha un parametro as_swarm
+from models.swarm_trajectory import SwarmTrajectory
+from utils.math_tools import minimum_jerk_3d, polynomial_3d, quintic_coefficients, scurve_coefficients
+
+
+# profili di moto disponibili:
+#   'minimum_jerk': quintica con jerk minimo (un solo polinomio per drone)
+#   'scurve':       S-curve tempo-ottima con v_max / a_max / j_max (cubica a 7 tratti, PiecewiseTrajectory)
+TRAJECTORY_PROFILES = ("minimum_jerk", "scurve")
+
+
+def _per_drone_values(swarm, values, default=0.0):
+    """
+    Normalizza un valore per drone in un array (N,) allineato allo Swarm.
+
+    :param values: None (-> default), scalare, dict {drone_id: valore} o array-like (N,) nell'ordine dello sciame
+    """
+    if values is None:
+        return np.full(len(swarm), float(default))
+    if isinstance(values, dict):
+        return swarm.gather(values)
+
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 0:
+        return np.full(len(swarm), float(values))
+    if values.shape != (len(swarm),):
+        raise ValueError("per-drone values must have one entry per drone")
+    return values
+
+
+def _scurve_trajectories(swarm, end_positions, durations, starts, max_jerk):
+    """
+    Profili S-curve di tutto lo sciame in un'unica passata vettorizzata, poi una PiecewiseTrajectory per drone.
+    Il profilo tempo-ottimo viene rallentato uniformemente fino alla durata richiesta (riscalando i breakpoints:
+    velocità, accelerazione e jerk scalano come 1/k, 1/k^2, 1/k^3 e restano quindi nei limiti).
+    """
+    if max_jerk is None:
+        raise ValueError("max_jerk is required for the 'scurve' profile")
+
+    breakpoints, coefficients = scurve_coefficients(swarm.positions, end_positions, swarm.max_velocity,
+                                                    swarm.max_acceleration, max_jerk)
+    optimal = breakpoints[:, -1]
+
+    trajectories = {}
+    for i, drone_id in enumerate(swarm.drone_ids.tolist()):
+        if optimal[i] > 0:
+            trajectory_breakpoints = breakpoints[i] * (durations[i] / optimal[i])
+            trajectory_coefficients = coefficients[i]
+        else:
+            # drone già sul target: un unico segmento fermo
+            trajectory_breakpoints = np.array([0.0, durations[i]])
+            trajectory_coefficients = coefficients[i, :1] * np.array([1.0, 0.0, 0.0, 0.0])
+        trajectories[drone_id] = PiecewiseTrajectory(trajectory_breakpoints, trajectory_coefficients,
+                                                     start_time=float(starts[i]))
+    return trajectories
 
 
-def generate_trajectories(drones, assignment, duration):
+def generate_trajectories(drones, assignment, duration, as_swarm=False, start_times=None,
+                          profile="minimum_jerk", max_jerk=None):
     """
     Genera una traiettoria per ciascun drone assegnato.
 
-    :param drones: lista di oggetti Drone
+    :param drones: lista di oggetti Drone o Swarm
     :param assignment: dict {drone_id: target_position}
-    :param duration: durata totale della traiettoria [s]
-    :return: dict {drone_id: Trajectory}
+    :param duration: durata della traiettoria [s]: scalare (uguale per tutti), dict {drone_id: durata}
+                     o array (N,) nell'ordine di drones
+    :param as_swarm: se True ritorna un'unica SwarmTrajectory (array contigui per tutto lo sciame)
+    :param start_times: istanti di partenza, stesse forme ammesse per duration (default 0)
+    :param profile: profilo di moto, vedi TRAJECTORY_PROFILES
+    :param max_jerk: jerk massimo [m/s^3] (scalare o array (N,)), obbligatorio per il profilo 'scurve'
+    :return: dict {drone_id: Trajectory | PiecewiseTrajectory} oppure SwarmTrajectory
     """
-    trajectories = {}
+    if profile not in TRAJECTORY_PROFILES:
+        raise ValueError(f"Unknown trajectory profile '{profile}', expected one of {TRAJECTORY_PROFILES}")
+
+    swarm = to_swarm(drones)
+    durations = _per_drone_values(swarm, duration)
+    starts = _per_drone_values(swarm, start_times)
+    end_positions = swarm.gather(assignment)
 
-    for drone in drones:
-        drone_id = drone.drone_id
-        p0 = drone.initial_position
-        pf = assignment[drone_id]
+    if profile == "scurve":
+        if as_swarm:
+            raise ValueError("as_swarm is only supported for the 'minimum_jerk' profile")
+        return _scurve_trajectories(swarm, end_positions, durations, starts, max_jerk)
 
-        traj_func = minimum_jerk_3d(p0, pf, duration)   # costruisce la funzione f(t) tale che f(0) = p0 e f(duration) = pf e andamento "smooth"
-        trajectories[drone_id] = Trajectory(duration, traj_func)    # creo l'istanza (l'oggetto) Trajectory
+    if as_swarm:
+        return SwarmTrajectory.from_minimum_jerk(swarm.drone_ids, swarm.positions, end_positions, durations, starts)
+
+    trajectories = {}
+
+    for drone_id, p0, pf, T, start_time in zip(swarm.drone_ids.tolist(), swarm.positions, end_positions,
+                                               durations, starts):
+        traj_func = minimum_jerk_3d(p0, pf, T)   # costruisce la funzione f(t) tale che f(0) = p0 e f(T) = pf e andamento "smooth"
+        trajectories[drone_id] = Trajectory(T, traj_func, start_time=float(start_time))    # creo l'istanza (l'oggetto) Trajectory
 
     return trajectories     # ritorno il dizionario creato
+
+
+def _quintic_continuity_rows(T):
+    """
+    Righe lineari (4, 6) che danno [jerk iniziale, jerk finale, snap iniziale, snap finale] di una quintica
+    di durata T in funzione dello stato agli estremi [p0, v0, a0, pf, vf, af].
+    """
+    # coefficienti in tau per ciascun vettore della base canonica dello stato: (6 stati, 6 coefficienti)
+    basis = quintic_coefficients(*np.eye(6), T)
+    jerk = np.array([[0, 0, 0, 6, 0, 0], [0, 0, 0, 6, 24, 60]], dtype=float) / T ** 3
+    snap = np.array([[0, 0, 0, 0, 24, 0], [0, 0, 0, 0, 24, 120]], dtype=float) / T ** 4
+    return np.vstack([jerk, snap]) @ basis.T
+
+
+def chained_boundary_states(waypoints, durations):
+    """
+    Velocità e accelerazioni ai waypoint di una catena di quintiche che parte e arriva da ferma
+    ma attraversa i waypoint intermedi senza fermarsi.
+
+    Le incognite (velocità e accelerazione a ogni waypoint interno) si ottengono imponendo la continuità di
+    jerk e snap (spline quintica C4, cioè a jerk minimo attraverso i waypoint). La matrice dipende solo dalle
+    durate, comuni a tutto lo sciame: un'unica np.linalg.solve risolve tutti i droni e tutti gli assi insieme.
+
+    :param waypoints: array (m + 1, N, 3) posizioni di partenza e target dei m passi
+    :param durations: array (m,) durata di ogni passo [s]
+    :return: (velocità (m + 1, N, 3), accelerazioni (m + 1, N, 3))
+    """
+    waypoints = np.asarray(waypoints, dtype=float)
+    durations = np.asarray(durations, dtype=float)
+    m = len(durations)
+
+    if waypoints.shape[0] != m + 1:
+        raise ValueError("waypoints must have one more entry than durations")
+    if np.any(durations <= 0):
+        raise ValueError("Trajectory duration must be positive")
+
+    velocities = np.zeros_like(waypoints)
+    accelerations = np.zeros_like(waypoints)
+    if m < 2:
+        return velocities, accelerations
+
+    # sistema globale per un asse: variabili [p_k, v_k, a_k] di ogni waypoint k -> colonna 3k + {0, 1, 2}
+    M = np.zeros((2 * (m - 1), 3 * (m + 1)))
+    for k in range(1, m):
+        before = _quintic_continuity_rows(durations[k - 1])    # segmento k-1: waypoint k-1 -> k
+        after = _quintic_continuity_rows(durations[k])         # segmento k:   waypoint k -> k+1
+        rows = slice(2 * (k - 1), 2 * k)
+        M[rows, 3 * (k - 1):3 * (k + 1)] += before[[1, 3]]     # jerk e snap finali del segmento k-1 ...
+        M[rows, 3 * k:3 * (k + 2)] -= after[[0, 2]]            # ... uguali a quelli iniziali del segmento k
+
+    interior = np.arange(1, m)
+    unknown = np.concatenate([3 * interior + 1, 3 * interior + 2])     # v e a dei waypoint interni
+    known = 3 * np.arange(m + 1)                                       # posizioni (v, a agli estremi = 0)
+
+    rhs = -M[:, known] @ waypoints.reshape(m + 1, -1)                  # (2(m-1), N * 3)
+    solution = np.linalg.solve(M[:, unknown], rhs)
+
+    velocities[1:m] = solution[:m - 1].reshape(m - 1, *waypoints.shape[1:])
+    accelerations[1:m] = solution[m - 1:].reshape(m - 1, *waypoints.shape[1:])
+    return velocities, accelerations
+
+
+def chained_coefficients(waypoints, durations):
+    """
+    Coefficienti (m, N, 3, 6) delle quintiche concatenate (vedi chained_boundary_states), in tau per passo.
+    """
+    waypoints = np.asarray(waypoints, dtype=float)
+    durations = np.asarray(durations, dtype=float)
+    velocities, accelerations = chained_boundary_states(waypoints, durations)
+    T = durations[:, None, None]
+    return quintic_coefficients(waypoints[:-1], velocities[:-1], accelerations[:-1],
+                                waypoints[1:], velocities[1:], accelerations[1:], T)
+
+
+def generate_chained_trajectories(drones, waypoints, durations):
+    """
+    Traiettorie di più passi consecutivi senza hold, continue in velocità e accelerazione (nessuna sosta
+    ai target intermedi). Ogni passo è una quintica (polynomial_3d) con stato agli estremi non nullo.
+
+    :param drones: lista di oggetti Drone o Swarm (definisce l'ordine delle righe di waypoints)
+    :param waypoints: array (m + 1, N, 3)
+    :param durations: array (m,) durata di ogni passo [s]
+    :return: lista di m dict {drone_id: Trajectory}
+    """
+    swarm = to_swarm(drones)
+    coefficients = chained_coefficients(waypoints, durations)
+    drone_ids = swarm.drone_ids.tolist()
+
+    return [
+        {did: Trajectory(T, polynomial_3d(step_coefficients[i], T)) for i, did in enumerate(drone_ids)}
+        for step_coefficients, T in zip(coefficients, np.asarray(durations, dtype=float))
+    ]
@@ -1,25 +1,153 @@
 import numpy as np
 
-from core.trajectory_generator import generate_trajectories
+from core.trajectory_generator import chained_coefficients, generate_chained_trajectories, generate_trajectories
 from core.trajectory_validator import (
     validate_trajectory,
     validate_swarm_trajectories,
     check_constraints_and_collisions,
     #summarize_swarm_violations,
 )
+from models.swarm import as_swarm
+from utils.math_tools import minimum_jerk_duration, polyval_normalized, scurve_duration
 
 
-def time_scale_trajectories(drones, assignment, duration, max_iterations=3, dt_check=0.01, eps=1e-6):
+TIME_SCALING_METHODS = ("analytic", "sampling")
+TIMING_MODES = ("swarm", "per_drone")
+TIMING_ALIGNMENTS = ("arrival", "departure")
+
+# durata minima di una traiettoria (un drone che non si sposta ha durata ottima nulla, non ammessa da Trajectory)
+MIN_TRAJECTORY_DURATION = 1e-3
+
+
+def minimum_feasible_durations(drones, assignment, profile="minimum_jerk", max_jerk=None):
+    """
+    Durata minima di ogni drone perché la sua traiettoria rispetti v_max e a_max (e j_max per 'scurve').
+    Un'unica passata vettorizzata: distanze, limiti e durate minime calcolati come array.
+
+    :param drones: lista di oggetti Drone o Swarm (posizioni di partenza e limiti dinamici)
+    :param assignment: dict {drone_id: target_position}
+    :param profile: profilo di moto ('minimum_jerk' o 'scurve', vedi generate_trajectories)
+    :param max_jerk: jerk massimo [m/s^3], obbligatorio per 'scurve'
+    :return: array (N,) di durate [s], nell'ordine di drones
+    """
+    if not len(drones):
+        return np.zeros(0)
+
+    swarm = as_swarm(drones)
+    distances = np.linalg.norm(swarm.gather(assignment) - swarm.positions, axis=1)
+
+    if profile == "scurve":
+        if max_jerk is None:
+            raise ValueError("max_jerk is required for the 'scurve' profile")
+        return scurve_duration(distances, swarm.max_velocity, swarm.max_acceleration, max_jerk)
+    return minimum_jerk_duration(distances, swarm.max_velocity, swarm.max_acceleration)
+
+
+def minimum_feasible_duration(drones, assignment, duration=0.0, eps=1e-6, profile="minimum_jerk", max_jerk=None):
+    """
+    Durata minima comune a tutto lo sciame: la più lunga tra le durate minime dei singoli droni.
+
+    :param duration: durata richiesta: il risultato non è mai inferiore
+    :param eps: margine relativo aggiunto quando la durata va allungata (evita violazioni per arrotondamento)
+    :return: durata [s]
+    """
+    required = float(np.max(minimum_feasible_durations(drones, assignment, profile, max_jerk), initial=0.0))
+
+    if required > duration:
+        return required * (1.0 + eps)
+    return float(duration)
+
+
+def _sampled_scale_factors(trajectories, drones, dt_check, eps):
+    """
+    Fattore di scala della durata di ogni drone, dai picchi campionati di velocità e accelerazione
+    (la velocità scala come 1/T, l'accelerazione come 1/T^2). > 1 significa vincolo violato.
+    """
+    scales = np.zeros(len(drones))
+    for k, drone in enumerate(drones):
+        res = validate_trajectory(trajectories[drone.drone_id], drone, dt=dt_check, eps=eps)
+        scales[k] = max(res["max_speed"] / drone.max_velocity,
+                        (res["max_acceleration"] / drone.max_acceleration) ** 0.5)
+    return scales
+
+
+def _time_scale_per_drone(drones, assignment, duration, max_iterations, dt_check, eps, method, align,
+                          profile, max_jerk):
+    """
+    Ogni drone vola con la propria durata minima ammissibile T_i. La finestra della transizione è
+    W = max(duration, max T_i); con align='arrival' i droni partono a W - T_i e arrivano tutti insieme,
+    con align='departure' partono tutti a 0 e chi finisce prima resta fermo (hover) sul target.
+    """
+    if method == "analytic":
+        durations = minimum_feasible_durations(drones, assignment, profile, max_jerk) * (1.0 + eps)
+        durations = np.maximum(durations, MIN_TRAJECTORY_DURATION)
+    else:
+        # campionamento: il riscalamento per drone è esatto per profili che scalano con T, qualche
+        # iterazione in più assorbe l'errore di campionamento
+        durations = np.full(len(drones), float(duration))
+        for _ in range(max_iterations):
+            trajectories = generate_trajectories(drones, assignment, durations, profile=profile, max_jerk=max_jerk)
+            scales = _sampled_scale_factors(trajectories, drones, dt_check, eps)
+            new_durations = np.maximum(durations * scales * (1.0 + eps), MIN_TRAJECTORY_DURATION)
+            converged = np.all(scales <= 1.0 + eps) and np.allclose(new_durations, durations, rtol=1e-3)
+            durations = new_durations
+            if converged:
+                break
+
+    window = max(float(duration), float(np.max(durations, initial=0.0)))
+    start_times = window - durations if align == "arrival" else np.zeros(len(drones))
+
+    trajectories = generate_trajectories(drones, assignment, durations, start_times=start_times,
+                                         profile=profile, max_jerk=max_jerk)
+    return trajectories, window
+
+
+def time_scale_trajectories(drones, assignment, duration, max_iterations=3, dt_check=0.01, eps=1e-6,
+                            method="analytic", mode="swarm", align="arrival", profile="minimum_jerk", max_jerk=None):
     """
     Rigenera le traiettorie aumentando la durata se violano velocità o accelerazione massima.
-    Miglioria: scala la durata con il fattore PEGGIORE (massimo tra tutti i droni) ad ogni iterazione,
+
+    method='analytic' (default): per le traiettorie minimum jerk i picchi di velocità e accelerazione sono
+    multipli noti di D/T e D/T^2, quindi la durata minima si ottiene in forma chiusa per tutto lo sciame
+    (minimum_feasible_duration) e le traiettorie vengono generate una sola volta.
+
+    method='sampling': fallback per traiettorie non polinomiali. Campiona ogni drone con passo dt_check e
+    scala la durata con il fattore PEGGIORE (massimo tra tutti i droni) ad ogni iterazione,
     per convergere più velocemente e ridurre violazioni residue.
     Usa eps come tolleranza numerica.
+
+    profile='scurve': profilo S-curve tempo-ottimo con jerk limitato a max_jerk (durata minima in forma chiusa,
+    scurve_duration); con profile='minimum_jerk' (default) quintica minimum jerk.
+
+    mode='swarm' (default): una durata unica per tutto lo sciame, dettata dal drone più lento.
+    mode='per_drone': ogni drone ha la propria durata minima (Trajectory.duration) e uno start_time che
+    la allinea all'arrivo comune (align='arrival') o alla partenza comune (align='departure').
+
+    :return: (dict {drone_id: Trajectory}, durata della finestra di transizione [s])
     """
+    if method not in TIME_SCALING_METHODS:
+        raise ValueError(f"Unknown time scaling method '{method}', expected one of {TIME_SCALING_METHODS}")
+    if mode not in TIMING_MODES:
+        raise ValueError(f"Unknown timing mode '{mode}', expected one of {TIMING_MODES}")
+    if align not in TIMING_ALIGNMENTS:
+        raise ValueError(f"Unknown timing alignment '{align}', expected one of {TIMING_ALIGNMENTS}")
+
+    drones = as_swarm(drones)   # gather delle posizioni e dei limiti una sola volta per tutte le iterazioni
+
+    if mode == "per_drone":
+        return _time_scale_per_drone(drones, assignment, duration, max_iterations, dt_check, eps, method, align,
+                                     profile, max_jerk)
+
     current_duration = float(duration)
 
+    if method == "analytic":
+        current_duration = minimum_feasible_duration(drones, assignment, current_duration, eps=eps,
+                                                     profile=profile, max_jerk=max_jerk)
+        trajectories = generate_trajectories(drones, assignment, current_duration, profile=profile, max_jerk=max_jerk)
+        return trajectories, current_duration
+
     for _ in range(max_iterations):
-        trajectories = generate_trajectories(drones, assignment, current_duration)
+        trajectories = generate_trajectories(drones, assignment, current_duration, profile=profile, max_jerk=max_jerk)
 
         # calcolo del fattore di scala globale necessario
         global_scale = 1.0
@@ -42,6 +170,53 @@ def time_scale_trajectories(drones, assignment, duration, max_iterations=3, dt_c
     return trajectories, current_duration
 
 
+def _chain_peak_ratios(swarm, waypoints, durations, samples_per_step=257):
+    """
+    Rapporto tra picco e limite (velocità, e radice del rapporto per l'accelerazione) della catena di ogni
+    drone, stimato su una griglia densa in tau di ogni passo: (N,).
+    """
+    coefficients = chained_coefficients(waypoints, durations)       # (m, N, 3, 6)
+    tau = np.linspace(0.0, 1.0, samples_per_step)[:, None, None, None]
+    T = durations[:, None, None]
+
+    speed = np.linalg.norm(polyval_normalized(coefficients, tau, order=1) / T, axis=-1)        # (G, m, N)
+    accel = np.linalg.norm(polyval_normalized(coefficients, tau, order=2) / T ** 2, axis=-1)
+    return np.maximum(speed.max(axis=(0, 1)) / swarm.max_velocity,
+                      np.sqrt(accel.max(axis=(0, 1)) / swarm.max_acceleration))
+
+
+def time_scale_chain(drones, waypoints, durations, eps=1e-3):
+    """
+    Durate di una catena di passi consecutivi senza hold (traiettorie continue in velocità,
+    vedi generate_chained_trajectories), rispettando v_max e a_max di ogni drone.
+
+    Punto di partenza: per ogni passo la durata richiesta o, se maggiore, la durata minima da fermo a fermo.
+    Poi un riscalamento UNIFORME di tutte le durate per il fattore f: la catena mantiene la stessa forma, con
+    velocità / f e accelerazioni / f^2. f è il minimo che rispetta i limiti (più un margine relativo eps per la
+    stima campionata dei picchi), ma non scende sotto la durata richiesta di nessun passo.
+
+    :param drones: lista di oggetti Drone o Swarm, nell'ordine delle righe di waypoints
+    :param waypoints: array (m + 1, N, 3) posizioni di partenza e target dei passi
+    :param durations: array-like (m,) durate richieste [s]
+    :return: (lista di m dict {drone_id: Trajectory}, array (m,) durate effettive)
+    """
+    swarm = as_swarm(drones)
+    waypoints = np.asarray(waypoints, dtype=float)
+    requested = np.asarray(durations, dtype=float)
+
+    rest_to_rest = np.array([
+        minimum_feasible_duration(swarm.with_positions(waypoints[k]),
+                                  dict(zip(swarm.drone_ids.tolist(), waypoints[k + 1])))
+        for k in range(len(requested))
+    ])
+    base = np.maximum(np.maximum(requested, rest_to_rest), MIN_TRAJECTORY_DURATION)
+
+    ratio = float(np.max(_chain_peak_ratios(swarm, waypoints, base), initial=0.0)) * (1.0 + eps)
+    factor = max(ratio, float(np.max(requested / base)))
+    final_durations = base * factor
+
+    return generate_chained_trajectories(swarm, waypoints, final_durations), final_durations
+
 import numpy as np
 from core.trajectory_validator import validate_swarm_trajectories
 
@@ -1,23 +1,26 @@
 import numpy as np
 
+from core.broad_phase import broad_phase_violations, culled_pairs
+from core.closest_approach import evaluate_pieces, exact_swarm_violations, stack_pieces
+from core.conservative_advancement import adaptive_swarm_violations
+
 
 def validate_trajectory(traj, drone, dt=0.01, eps=1e-9):
     """
     Controlla velocità e accelerazione massima di un drone lungo la traiettoria.
     Usa una piccola tolleranza eps per evitare falsi positivi numerici.
+    Velocità e accelerazione sono valutate in forma chiusa (Trajectory.velocity / acceleration)
+    sui campioni dell'intervallo di moto [start_time, start_time + duration].
     """
-    # Campionamento locale sulla durata della traiettoria (tempo interno, gestito da Trajectory.position)
-    t_samples = np.arange(0, traj.duration + dt, dt)
-    positions = np.array([traj.position(t) for t in t_samples]) # valuta la posizione della traiettoria a ciascun tempo -> ottieni una matrice di dimensione (N,d) dove d è la dimensione spaziale (3D)
+    # Campionamento sulla durata della traiettoria, a partire dal suo start_time
+    start_time = getattr(traj, "start_time", 0.0)
+    t_samples = start_time + np.arange(0, traj.duration + dt, dt)
 
-    # Velocità (derivata prima discretizzata)
-    velocities = np.diff(positions, axis=0) / dt    # calcola pos[i+1] - pos[]i
-    speed = np.linalg.norm(velocities, axis=1)  # calcola la norma Euclidea ad ogni passo
+    # Velocità e accelerazione analitiche in un'unica chiamata vettorizzata
+    speed = np.linalg.norm(traj.velocity(t_samples), axis=1)  # calcola la norma Euclidea ad ogni campione
     max_speed = np.max(speed) if len(speed) > 0 else 0.0
 
-    # Accelerazione (derivata seconda discretizzata)    # stesso concetto ma applicato alla velocità
-    accelerations = np.diff(velocities, axis=0) / dt
-    accel = np.linalg.norm(accelerations, axis=1)
+    accel = np.linalg.norm(traj.acceleration(t_samples), axis=1)
     max_accel = np.max(accel) if len(accel) > 0 else 0.0
 
     # Validazione con tolleranza
@@ -32,36 +35,184 @@ def validate_trajectory(traj, drone, dt=0.01, eps=1e-9):
     }
 
 
-def validate_swarm_trajectories(trajectories, drones, min_distance=0.5, dt=0.01):
+# memoria massima (byte) delle differenze di posizione di un blocco di tempi nel controllo a coppie
+PAIRWISE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _pairwise_violations(all_positions, min_distance, block_size=None):
+    """
+    Kernel vettorizzato del controllo di distanza: tutte le coppie i<j (indici del triangolo superiore)
+    per blocchi di istanti.
+
+    :param all_positions: array (T, N, 3) posizioni di tutti i droni a tutti i tempi
+    :param block_size: numero di istanti per blocco (default: entro PAIRWISE_BLOCK_BYTES)
+    :return: (indici dei tempi, indici i, indici j) delle coppie più vicine di min_distance,
+             ordinati per tempo e poi per coppia (i, j) come nel doppio ciclo i<j
+    """
+    num_times, N, _ = all_positions.shape
+    pair_i, pair_j = np.triu_indices(N, k=1)
+
+    if block_size is None:
+        block_size = max(1, PAIRWISE_BLOCK_BYTES // max(1, len(pair_i) * 3 * all_positions.itemsize))
+
+    time_idx, pair_idx = [], []
+    for start in range(0, num_times, block_size):
+        block = all_positions[start:start + block_size]                       # (B, N, 3)
+        dist = np.linalg.norm(block[:, pair_i] - block[:, pair_j], axis=-1)    # (B, P)
+        k, p = np.nonzero(dist < min_distance)                                # ordine (tempo, coppia)
+        time_idx.append(k + start)
+        pair_idx.append(p)
+
+    time_idx = np.concatenate(time_idx) if time_idx else np.zeros(0, dtype=int)
+    pair_idx = np.concatenate(pair_idx) if pair_idx else np.zeros(0, dtype=int)
+    return time_idx, pair_i[pair_idx], pair_j[pair_idx]
+
+
+# metodi del controllo di distanza: 'all_pairs' (tutte le coppie), 'broad_phase' (KD-tree per istante),
+# 'aabb' (solo coppie con bounding box sovrapposti per finestra temporale),
+# 'auto' (broad phase da BROAD_PHASE_MIN_DRONES droni in su), 'exact' (a tempo continuo, senza campionamento),
+# 'adaptive' (passo adattivo per coppia, conservative advancement)
+COLLISION_CHECK_METHODS = ("auto", "all_pairs", "broad_phase", "aabb", "exact", "adaptive")
+BROAD_PHASE_MIN_DRONES = 500
+
+# durata [s] delle finestre temporali dei bounding box ('aabb', 'exact' e 'adaptive')
+AABB_WINDOW_DURATION = 0.5
+
+
+def _culled_violations(trajectories, drone_ids, t_samples, dt, min_distance, window_duration):
+    """
+    Controllo a campioni preceduto dal culling con bounding box: per ogni finestra di campioni consecutivi
+    si calcolano le distanze solo delle coppie i cui box (analitici, gonfiati di min_distance) si sovrappongono.
+    Stesso risultato e stesso ordine (tempo, i, j) del kernel a coppie.
+
+    :return: (indici dei tempi, indici i, indici j)
+    """
+    # finestre di window_samples campioni consecutivi; l'ultima si chiude dopo l'ultimo campione
+    window_samples = max(1, int(round(window_duration / dt)))
+    window_edges = np.append(t_samples[::window_samples], t_samples[-1] + dt)
+    breakpoints, coefficients = stack_pieces([trajectories[did] for did in drone_ids], window_edges[-1])
+    window_idx, cand_i, cand_j = culled_pairs(breakpoints, coefficients, min_distance, window_edges)
+    bounds = np.searchsorted(window_idx, np.arange(len(window_edges)))
+
+    time_idx, all_i, all_j = [], [], []
+    for w in range(len(window_edges) - 1):
+        pair_i, pair_j = cand_i[bounds[w]:bounds[w + 1]], cand_j[bounds[w]:bounds[w + 1]]
+        if len(pair_i) == 0:
+            continue
+
+        # posizioni dei soli droni coinvolti nelle coppie candidate
+        involved, inverse = np.unique(np.concatenate([pair_i, pair_j]), return_inverse=True)
+        first = w * window_samples
+        times = t_samples[first:first + window_samples]
+        positions = evaluate_pieces(breakpoints[involved], coefficients[involved], times[:, None])    # (B, n, 3)
+        a, b = inverse[:len(pair_i)], inverse[len(pair_i):]
+
+        block_size = max(1, PAIRWISE_BLOCK_BYTES // (len(pair_i) * 3 * 8))
+        for start in range(0, len(times), block_size):
+            block = positions[start:start + block_size]
+            dist = np.linalg.norm(block[:, a] - block[:, b], axis=-1)      # (B, P)
+            k, p = np.nonzero(dist < min_distance)                        # ordine (tempo, coppia)
+            time_idx.append(k + first + start)
+            all_i.append(pair_i[p])
+            all_j.append(pair_j[p])
+
+    if not time_idx:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty
+    return np.concatenate(time_idx), np.concatenate(all_i), np.concatenate(all_j)
+
+
+def _exact_candidate_pairs(trajectories, drone_ids, min_distance, window_duration):
+    """Coppie (drone_id_i, drone_id_j) con bounding box sovrapposti in almeno una finestra, per il controllo esatto."""
+    T_end = max(trajectories[did].start_time + trajectories[did].duration for did in drone_ids)
+    window_edges = np.append(np.arange(0.0, T_end, window_duration), T_end)
+    breakpoints, coefficients = stack_pieces([trajectories[did] for did in drone_ids], T_end)
+    _, cand_i, cand_j = culled_pairs(breakpoints, coefficients, min_distance, window_edges)
+
+    N = len(drone_ids)
+    unique_pairs = np.unique(cand_i * N + cand_j)
+    return [(drone_ids[i], drone_ids[j]) for i, j in zip((unique_pairs // N).tolist(), (unique_pairs % N).tolist())]
+
+
+def validate_swarm_trajectories(trajectories, drones, min_distance=0.5, dt=0.01, block_size=None,
+                                method="auto", broad_phase_min_drones=BROAD_PHASE_MIN_DRONES,
+                                window_duration=AABB_WINDOW_DURATION):
     """
     Controlla distanza minima tra tutti i droni lungo la traiettoria.
     Considera l'orizzonte temporale GLOBALE (start_time + duration) per ciascun drone.
-    Ritorna lista di violazioni [(drone_id1, drone_id2, t), ...].
+    Le posizioni sono valutate per blocchi di block_size istanti; in ogni blocco le coppie vicine si cercano
+    con il kernel a coppie vettorizzato o, per sciami grandi, con un KD-tree per istante (broad phase),
+    che esamina solo i droni entro min_distance. Con method='aabb' (solo traiettorie polinomiali) si controllano,
+    finestra per finestra, solo le coppie i cui bounding box si sovrappongono. Il risultato è lo stesso con
+    tutti questi metodi.
+    Ritorna lista di violazioni [(drone_id1, drone_id2, t), ...], ordinata per tempo e poi per coppia.
+
+    Con method='exact' (solo traiettorie polinomiali) dt e block_size non si usano: la distanza delle coppie
+    con bounding box sovrapposti è controllata a tempo continuo (core.closest_approach) e si ottiene UNA
+    violazione per coppia, al primo istante in cui la distanza scende sotto min_distance, ordinate per tempo.
+    Con method='adaptive' (solo traiettorie polinomiali) dt non si usa: ogni coppia avanza con un passo pari al
+    margine di separazione diviso per la massima velocità relativa (core.conservative_advancement), con ricerca
+    esatta quando i droni sono quasi a contatto; anche in questo caso si ottiene una violazione per coppia,
+    al primo istante in cui la distanza scende sotto min_distance.
+
+    :param method: 'auto', 'all_pairs', 'broad_phase', 'aabb', 'exact' o 'adaptive'
+    :param broad_phase_min_drones: numero di droni da cui 'auto' passa alla broad phase
+    :param window_duration: durata [s] delle finestre dei bounding box ('aabb', 'exact' e 'adaptive')
     """
+    if method not in COLLISION_CHECK_METHODS:
+        raise ValueError(f"Unknown collision check method '{method}', expected one of {COLLISION_CHECK_METHODS}")
+
     drone_ids = list(trajectories.keys())   # estrai ID dei droni dello sciame
-    violations = []
+    N = len(drone_ids)
+
+    if method == "exact":
+        pairs = _exact_candidate_pairs(trajectories, drone_ids, min_distance, window_duration)
+        return exact_swarm_violations(trajectories, min_distance, pairs=pairs)
+    if method == "adaptive":
+        return adaptive_swarm_violations(trajectories, min_distance, window_duration=window_duration)
 
     # Tempo globale di fine (considera ritardi)
     T_end = max(trajectories[did].start_time + trajectories[did].duration for did in drone_ids)
     t_samples = np.arange(0, T_end + dt, dt)    # crea campioni temporali da t=0 a t_end incluso
 
-    for t in t_samples: # per ogni tempo, calcola le posizioni di tutti i droni
-        positions = np.array([trajectories[did].position(t) for did in drone_ids])
-        # Controlla tutte le coppie i<j
-        for i in range(len(drone_ids)):
-            for j in range(i + 1, len(drone_ids)):
-                dist = np.linalg.norm(positions[i] - positions[j]) # calcolo la distanza euclidea tra le posizioni
-                if dist < min_distance:
-                    violations.append((drone_ids[i], drone_ids[j], float(t)))
+    if method == "aabb":
+        time_idx, pair_i, pair_j = _culled_violations(trajectories, drone_ids, t_samples, dt, min_distance,
+                                                      window_duration)
+        return [(drone_ids[i], drone_ids[j], float(t_samples[k]))
+                for k, i, j in zip(time_idx.tolist(), pair_i.tolist(), pair_j.tolist())]
+
+    use_broad_phase = method == "broad_phase" or (method == "auto" and N >= broad_phase_min_drones)
+    if block_size is None:
+        # memoria per istante: posizioni (N, 3) con la broad phase, differenze di tutte le coppie altrimenti
+        per_time = N if use_broad_phase else max(1, N * (N - 1) // 2)
+        block_size = max(1, PAIRWISE_BLOCK_BYTES // (per_time * 3 * 8))
+
+    violations = []
+    for start in range(0, len(t_samples), block_size):
+        block_times = t_samples[start:start + block_size]
+
+        # posizioni di tutti i droni nel blocco: una chiamata vettorizzata per drone -> (B, N, 3)
+        block_positions = np.stack([trajectories[did].position(block_times) for did in drone_ids], axis=1)
+
+        if use_broad_phase:
+            time_idx, pair_i, pair_j = broad_phase_violations(block_positions, min_distance)
+        else:
+            time_idx, pair_i, pair_j = _pairwise_violations(block_positions, min_distance, len(block_times))
+
+        violations.extend((drone_ids[i], drone_ids[j], float(block_times[k]))
+                          for k, i, j in zip(time_idx.tolist(), pair_i.tolist(), pair_j.tolist()))
 
     return violations
 
 
-def check_constraints_and_collisions(trajectories, drones, min_distance=0.5, dt=0.01, eps=1e-9):
+def check_constraints_and_collisions(trajectories, drones, min_distance=0.5, dt=0.01, eps=1e-9,
+                                     method="auto", broad_phase_min_drones=BROAD_PHASE_MIN_DRONES,
+                                     window_duration=AABB_WINDOW_DURATION):
     """
     Punto unico di verità:
       - verifica vincoli dinamici per ogni drone (vel/acc),
-      - verifica collisioni nello sciame (distanza minima).
+      - verifica collisioni nello sciame (distanza minima; method / broad_phase_min_drones / window_duration
+        come in validate_swarm_trajectories).
     """
     per_drone = {}
     any_dyn_violation = False
@@ -72,7 +223,9 @@ def check_constraints_and_collisions(trajectories, drones, min_distance=0.5, dt=
         if (not res["valid_speed"]) or (not res["valid_acceleration"]):
             any_dyn_violation = True
 
-    swarm_violations = validate_swarm_trajectories(trajectories, drones, min_distance=min_distance, dt=dt)
+    swarm_violations = validate_swarm_trajectories(trajectories, drones, min_distance=min_distance, dt=dt,
+                                                   method=method, broad_phase_min_drones=broad_phase_min_drones,
+                                                   window_duration=window_duration)
 
     return {
         "dynamic_ok": (not any_dyn_violation),
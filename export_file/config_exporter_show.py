@@ -3,7 +3,16 @@ import yaml
 import os
 
 
-def export_show_config_to_yaml(shape_dict, output_path="config/show_config.yaml"):
+DEFAULT_ASSIGNMENT_OPTIONS = {
+    'method': 'dense',   # 'dense', 'sparse' (k target più vicini), 'bottleneck' (min distanza massima) o 'partitioned' (celle in parallelo)
+    'k_nearest': 16,
+    'metric': 'euclidean',              # 'euclidean' o 'sqeuclidean' (meno incroci tra i percorsi)
+    # cache su disco opzionale: aggiungere 'cache_dir' (e 'cache_max_mb', default 64) per attivarla
+}
+
+
+def export_show_config_to_yaml(shape_dict, output_path="config/show_config.yaml", assignment_options=None,
+                               trajectory_options=None):
     """
     Esporta la configurazione dello show in formato YAML.
 
@@ -12,6 +21,9 @@ def export_show_config_to_yaml(shape_dict, output_path="config/show_config.yaml"
     Args:
         shape_dict: dizionario con formato {"step_0": {...}, "step_1": {...}}
         output_path: percorso del file YAML di output
+        assignment_options: opzioni del solver di assegnazione (default: DEFAULT_ASSIGNMENT_OPTIONS)
+        trajectory_options: opzioni delle traiettorie scritte al primo livello,
+                            es. {'trajectory_type': 'scurve', 'max_jerk': 5.0} (default: minimum jerk)
 
     Returns:
         str: percorso del file creato
@@ -100,7 +112,11 @@ def export_show_config_to_yaml(shape_dict, output_path="config/show_config.yaml"
         sequences.append(sequence_entry)
 
     # Crea la struttura finale
-    yaml_data = {'sequences': sequences}
+    yaml_data = {
+        'assignment': dict(DEFAULT_ASSIGNMENT_OPTIONS if assignment_options is None else assignment_options),
+        **(trajectory_options or {}),
+        'sequences': sequences
+    }
 
     # Crea la cartella config se non esiste
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -0,0 +1,214 @@
+
+"""
+Salvataggio / caricamento binario di uno show già costruito (ShowSequencer.build_show).
+
+Layout su disco (una cartella di file .npy grezzi + manifest.json):
+    manifest.json            versione del formato, numero di droni/sequenze, tipi di formazione, fps
+    drone_ids.npy            (N,)
+    cumulative_times.npy     (Q + 1,)   inizio di ogni sequenza e fine dello show
+    transition_durations.npy (Q,)
+    hold_durations.npy       (Q,)
+    start_times.npy          (Q, N)     start_time di ogni traiettoria (locale alla sequenza)
+    durations.npy            (Q, N)     durata di ogni traiettoria
+    assignments.npy          (Q, N, 3)  target assegnato a ogni drone in ogni sequenza
+    track_breakpoints.npy    (N, S + 1) traccia dell'intero show per drone (PiecewiseTrajectory) ...
+    track_coefficients.npy   (N, S, 3, K)  ... allineate a S segmenti con segmenti di lunghezza nulla
+
+I file .npy si riaprono con mmap_mode='r': il caricamento legge solo header e manifest, i dati vengono
+letti dal disco solo quando servono (quasi zero copie anche per migliaia di droni).
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from models.piecewise_trajectory import PiecewiseTrajectory
+
+
+SHOW_FORMAT = "drone_show"
+SHOW_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+ARRAY_NAMES = (
+    "drone_ids",
+    "cumulative_times",
+    "transition_durations",
+    "hold_durations",
+    "start_times",
+    "durations",
+    "assignments",
+    "track_breakpoints",
+    "track_coefficients",
+)
+
+
+def _pad_tracks(tracks):
+    """
+    Allinea le tracce allo stesso numero di segmenti e allo stesso grado.
+    I segmenti aggiunti hanno lunghezza nulla e restano fermi sulla posizione finale.
+    """
+    S = max(track.num_segments for track in tracks)
+    K = max(track.coefficients.shape[2] for track in tracks)
+
+    breakpoints = np.zeros((len(tracks), S + 1))
+    coefficients = np.zeros((len(tracks), S, 3, K))
+    for i, track in enumerate(tracks):
+        s = track.num_segments
+        breakpoints[i, :s + 1] = track.breakpoints
+        breakpoints[i, s + 1:] = track.breakpoints[-1]
+        coefficients[i, :s, :, :track.coefficients.shape[2]] = track.coefficients
+        coefficients[i, s:, :, 0] = track.position(track.duration)
+
+    return breakpoints, coefficients
+
+
+def save_show(sequencer, output_dir):
+    """
+    Salva uno show costruito in una cartella di file .npy + manifest.json.
+
+    :param sequencer: ShowSequencer su cui è già stato chiamato build_show()
+    :param output_dir: cartella di destinazione (creata se non esiste)
+    :return: percorso della cartella
+    """
+    if not sequencer.sequences:
+        raise ValueError("The show has not been built yet")
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    drone_ids = [d.drone_id for d in sequencer.drones]
+    sequences = sequencer.sequences
+
+    tracks = [sequencer.build_drone_track(did) for did in drone_ids]
+    track_breakpoints, track_coefficients = _pad_tracks(tracks)
+
+    arrays = {
+        "drone_ids": np.asarray(drone_ids),
+        "cumulative_times": np.asarray(sequencer.cumulative_times, dtype=float),
+        "transition_durations": np.array([seq['transition_duration'] for seq in sequences], dtype=float),
+        "hold_durations": np.array([seq['hold_duration'] for seq in sequences], dtype=float),
+        "start_times": np.array([[seq['trajectories'][did].start_time for did in drone_ids]
+                                 for seq in sequences], dtype=float),
+        "durations": np.array([[seq['trajectories'][did].duration for did in drone_ids]
+                               for seq in sequences], dtype=float),
+        "assignments": np.array([[seq['assignment'][did] for did in drone_ids]
+                                 for seq in sequences], dtype=float),
+        "track_breakpoints": track_breakpoints,
+        "track_coefficients": track_coefficients,
+    }
+
+    for name, array in arrays.items():
+        np.save(output_path / f"{name}.npy", array, allow_pickle=False)
+
+    manifest = {
+        "format": SHOW_FORMAT,
+        "version": SHOW_FORMAT_VERSION,
+        "num_drones": len(drone_ids),
+        "num_sequences": len(sequences),
+        "formation_types": [seq['type'] for seq in sequences],
+        "fps": sequencer.get_fps(),
+        "arrays": {name: {"shape": list(array.shape), "dtype": str(array.dtype)} for name, array in arrays.items()},
+    }
+
+    # il manifest viene scritto per ultimo (e in modo atomico): la sua presenza indica un salvataggio completo
+    tmp_path = output_path / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, output_path / MANIFEST_NAME)
+
+    return str(output_path)
+
+
+def load_show(input_dir, mmap_mode='r'):
+    """
+    Riapre uno show salvato con save_show.
+
+    :param input_dir: cartella dello show
+    :param mmap_mode: modalità di np.load ('r' = memory map in sola lettura, None = carica in memoria)
+    :return: SavedShow
+    """
+    input_path = Path(input_dir)
+    with open(input_path / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != SHOW_FORMAT:
+        raise ValueError(f"{input_path} does not contain a saved drone show")
+    if manifest.get("version") != SHOW_FORMAT_VERSION:
+        raise ValueError(f"Unsupported show format version {manifest.get('version')}, "
+                         f"expected {SHOW_FORMAT_VERSION}")
+
+    arrays = {name: np.load(input_path / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+              for name in ARRAY_NAMES}
+    return SavedShow(manifest, arrays)
+
+
+class SavedShow:
+    """
+    Show caricato da disco. Espone la stessa interfaccia di lettura di ShowSequencer usata da exporter e
+    analisi (get_position(s), get_velocity/ies, get_total_duration, get_fps, build_drone_track), valutando
+    le tracce per drone direttamente sugli array (eventualmente memory-mapped).
+    """
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.drone_ids = arrays["drone_ids"]
+        self.cumulative_times = arrays["cumulative_times"]
+        self.transition_durations = arrays["transition_durations"]
+        self.hold_durations = arrays["hold_durations"]
+        self.start_times = arrays["start_times"]
+        self.durations = arrays["durations"]
+        self.assignments = arrays["assignments"]
+        self.track_breakpoints = arrays["track_breakpoints"]
+        self.track_coefficients = arrays["track_coefficients"]
+
+        self._index = {did: i for i, did in enumerate(self.drone_ids.tolist())}     # mappa id -> riga
+        self._tracks = {}
+
+    @property
+    def num_drones(self):
+        return len(self.drone_ids)
+
+    def get_total_duration(self) -> float:
+        """Ritorna la durata totale dello show"""
+        return float(self.cumulative_times[-1])
+
+    def get_fps(self) -> int:
+        """Ritorna gli FPS salvati"""
+        return self.manifest.get("fps", 20)
+
+    def get_assignment(self, seq_idx: int) -> dict:
+        """Assegnazione {drone_id: target} della sequenza seq_idx"""
+        return {did: np.asarray(self.assignments[seq_idx, i]) for did, i in self._index.items()}
+
+    def build_drone_track(self, drone_id) -> PiecewiseTrajectory:
+        """Traccia dell'intero show del drone (costruita una volta sola sugli array salvati)"""
+        if drone_id not in self._tracks:
+            i = self._index[drone_id]
+            self._tracks[drone_id] = PiecewiseTrajectory(self.track_breakpoints[i], self.track_coefficients[i])
+        return self._tracks[drone_id]
+
+    def get_positions(self, drone_id, times) -> np.ndarray:
+        """Posizioni (T, 3) di un drone ai tempi globali times"""
+        return self.build_drone_track(drone_id).position(np.asarray(times, dtype=float))
+
+    def get_velocities(self, drone_id, times) -> np.ndarray:
+        """Velocità (T, 3) di un drone ai tempi globali times (nulle dalla fine dello show in poi)"""
+        times = np.asarray(times, dtype=float)
+        velocities = self.build_drone_track(drone_id).velocity(times)
+        velocities[times >= self.get_total_duration()] = 0.0
+        return velocities
+
+    def get_position(self, drone_id, t: float) -> np.ndarray:
+        """Ritorna la posizione di un drone al tempo t globale"""
+        return self.build_drone_track(drone_id).position(float(t))
+
+    def get_velocity(self, drone_id, t: float) -> np.ndarray:
+        """Ritorna la velocità di un drone al tempo t globale"""
+        return self.get_velocities(drone_id, [t])[0]
+
+    # Rappresentazione leggibile in STRINGA
+    def __repr__(self):
+        return (f"SavedShow(num_drones={self.num_drones}, num_sequences={len(self.transition_durations)}, "
+                f"total_duration={self.get_total_duration():.2f}s)")
@@ -1,6 +1,6 @@
 
 """
-Exporter CSV delle traiettorie (posizioni + velocità stimate da posizioni).
+Exporter CSV delle traiettorie (posizioni + velocità analitiche dal sequencer, valutate in batch sui tempi).
 """
 
 import csv
@@ -16,35 +16,11 @@ def _safe_filename(drone_id):
         return f"drone_{sid}_trajectory.csv"
 
 
-def _central_diff_velocity(get_pos_fn, drone_id, t, dt, t0, t_end):
-    """
-    Stima v(t) con differenze finite centrali dove possibile, altrimenti forward/backward.
-    """
-    if dt <= 0:
-        return np.array([0.0, 0.0, 0.0], dtype=float)
-
-    # Proviamo centrale se ci sta dentro
-    t_prev = t - dt
-    t_next = t + dt
-    if t_prev >= t0 and t_next <= t_end:
-        p_prev = get_pos_fn(drone_id, t_prev)
-        p_next = get_pos_fn(drone_id, t_next)
-        return (p_next - p_prev) / (2.0 * dt)
-
-    # Bordo iniziale → forward
-    if t_next <= t_end:
-        p_curr = get_pos_fn(drone_id, t)
-        p_next = get_pos_fn(drone_id, t_next)
-        return (p_next - p_curr) / dt
-
-    # Bordo finale → backward
-    if t_prev >= t0:
-        p_prev = get_pos_fn(drone_id, t_prev)
-        p_curr = get_pos_fn(drone_id, t)
-        return (p_curr - p_prev) / dt
-
-    # Caso degenerato
-    return np.array([0.0, 0.0, 0.0], dtype=float)
+def _finite_rows(values):
+    """Righe (T, 3) con almeno una componente non finita sostituite interamente da NaN."""
+    values = np.asarray(values, dtype=float).copy()
+    values[~np.all(np.isfinite(values), axis=1)] = np.nan
+    return values
 
 
 def export_trajectories_to_csv(
@@ -57,7 +33,7 @@ def export_trajectories_to_csv(
     delimiter=","
 ):
     """
-    Esporta file per-drone con t,x,y,z + vx,vy,vz (velocità stimate da posizioni).
+    Esporta file per-drone con t,x,y,z + vx,vy,vz (velocità analitiche, sequencer.get_velocity).
     """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -81,24 +57,12 @@ def export_trajectories_to_csv(
         filename = _safe_filename(drone_id)
         filepath = output_path / filename
 
-        rows = []
-        for t in timestamps:
-            pos = np.asarray(sequencer.get_position(drone_id, float(t)), dtype=float)
-            if not np.all(np.isfinite(pos)):
-                pos = np.array([np.nan, np.nan, np.nan], dtype=float)
-
-            vel = _central_diff_velocity(
-                get_pos_fn=sequencer.get_position,
-                drone_id=drone_id,
-                t=float(t),
-                dt=dt,
-                t0=0.0,
-                t_end=float(total_duration)
-            )
-            if not np.all(np.isfinite(vel)):
-                vel = np.array([np.nan, np.nan, np.nan], dtype=float)
-
-            rows.append({
+        # posizioni e velocità a tutti i tempi con una chiamata vettorizzata ciascuna
+        positions = _finite_rows(sequencer.get_positions(drone_id, timestamps))
+        velocities = _finite_rows(sequencer.get_velocities(drone_id, timestamps))
+
+        rows = [
+            {
                 "t": float(t),
                 "x": float(pos[0]),
                 "y": float(pos[1]),
@@ -106,7 +70,9 @@ def export_trajectories_to_csv(
                 "vx": float(vel[0]),
                 "vy": float(vel[1]),
                 "vz": float(vel[2]),
-            })
+            }
+            for t, pos, vel in zip(timestamps, positions, velocities)
+        ]
 
         # scrittura
         with open(filepath, "w", newline="") as csvfile:
@@ -119,8 +85,6 @@ def export_trajectories_to_csv(
 
         # statistiche
         if len(rows) >= 2:
-            positions = np.array([[r["x"], r["y"], r["z"]] for r in rows], dtype=float)
-            velocities = np.array([[r["vx"], r["vy"], r["vz"]] for r in rows], dtype=float)
             max_speed = np.nanmax(np.linalg.norm(velocities, axis=1))
             total_distance = np.nansum(np.linalg.norm(np.diff(positions, axis=0), axis=1))
         else:
@@ -147,14 +111,13 @@ def export_summary_csv(
     delimiter=","
 ):
     """
-    Esporta un file unico (t,drone_id,x,y,z,vx,vy,vz) con v stimata da posizioni.
+    Esporta un file unico (t,drone_id,x,y,z,vx,vy,vz) con v analitica (sequencer.get_velocity).
     """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
     filepath = output_path / "all_drones_trajectory.csv"
 
-    dt = 1.0 / fps if fps > 0 else 0.0
     num_samples = int(total_duration * fps) + (1 if include_endpoint else 0)
     num_samples = max(num_samples, 1)
     timestamps = np.linspace(0, total_duration, num_samples)
@@ -167,24 +130,15 @@ def export_summary_csv(
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=delimiter)
         writer.writeheader()
 
-        for t in timestamps:
-            for drone in drones:
-                did = drone.drone_id
-                pos = np.asarray(sequencer.get_position(did, float(t)), dtype=float)
-                if not np.all(np.isfinite(pos)):
-                    pos = np.array([np.nan, np.nan, np.nan], dtype=float)
-
-                vel = _central_diff_velocity(
-                    get_pos_fn=sequencer.get_position,
-                    drone_id=did,
-                    t=float(t),
-                    dt=dt,
-                    t0=0.0,
-                    t_end=float(total_duration)
-                )
-                if not np.all(np.isfinite(vel)):
-                    vel = np.array([np.nan, np.nan, np.nan], dtype=float)
+        # (D, T, 3): una valutazione vettorizzata per drone, poi scrittura riga per riga nell'ordine (t, drone)
+        drone_ids = [drone.drone_id for drone in drones]
+        positions = np.stack([_finite_rows(sequencer.get_positions(did, timestamps)) for did in drone_ids])
+        velocities = np.stack([_finite_rows(sequencer.get_velocities(did, timestamps)) for did in drone_ids])
 
+        for k, t in enumerate(timestamps):
+            for d, did in enumerate(drone_ids):
+                pos = positions[d, k]
+                vel = velocities[d, k]
                 writer.writerow({
                     "t": float(t),
                     "drone_id": did,
@@ -0,0 +1,139 @@
+import numpy as np
+
+from utils.math_tools import minimum_jerk_coefficients, polyval_normalized
+
+
+class PiecewiseTrajectory:
+    """
+    Traiettoria 3D polinomiale a tratti (più waypoint, hold intermedi, o un intero show per un drone).
+
+    Memorizza:
+        - breakpoints:  (S + 1,)   istanti (locali, da 0 a duration) di inizio/fine dei segmenti, non decrescenti
+        - coefficients: (S, 3, K)  coefficienti di ogni segmento in potenze crescenti del tempo normalizzato
+                                   tau = (t - breakpoints[s]) / (breakpoints[s+1] - breakpoints[s]) in [0, 1]
+
+    Il segmento attivo si trova con una ricerca binaria (np.searchsorted) e tutti i tempi richiesti vengono
+    valutati in un'unica chiamata vettorizzata. I segmenti di lunghezza nulla sono ammessi e vengono ignorati.
+
+    Espone la stessa interfaccia di Trajectory (duration, start_time, position, velocity, acceleration, jerk,
+    sample), quindi può essere usata ovunque si usi una Trajectory.
+    """
+
+    # costruttore
+    def __init__(self, breakpoints, coefficients, start_time=0.0):
+        """
+        :param breakpoints: array-like (S + 1,) istanti dei segmenti; vengono riferiti al primo (breakpoints[0] -> 0)
+        :param coefficients: array-like (S, 3, K)
+        :param start_time: istante globale di partenza [s]
+        """
+        breakpoints = np.asarray(breakpoints, dtype=float)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+
+        if breakpoints.ndim != 1 or len(breakpoints) < 2:
+            raise ValueError("breakpoints must be a 1D array with at least two entries")
+        if self.coefficients.ndim != 3 or self.coefficients.shape[:2] != (len(breakpoints) - 1, 3):
+            raise ValueError("coefficients must be of shape (S, 3, K) with S = len(breakpoints) - 1")
+        if np.any(np.diff(breakpoints) < 0):
+            raise ValueError("breakpoints must be non-decreasing")
+
+        self.breakpoints = breakpoints - breakpoints[0]
+        self.duration = float(self.breakpoints[-1])
+        self.start_time = start_time
+
+        if self.duration <= 0:
+            raise ValueError("Trajectory duration must be positive")
+
+        # solo i segmenti di lunghezza positiva partecipano alla ricerca del segmento attivo
+        lengths = np.diff(self.breakpoints)
+        self._segments = np.flatnonzero(lengths > 0)
+        self._segment_starts = self.breakpoints[self._segments]
+        self._lengths = np.where(lengths > 0, lengths, 1.0)
+
+    @classmethod
+    def from_waypoints(cls, waypoints, segment_durations, start_time=0.0):
+        """
+        Passa per tutti i waypoint con tratti minimum jerk, fermandosi su ciascuno.
+
+        :param waypoints: array-like (S + 1, 3)
+        :param segment_durations: array-like (S,) o scalare, durata di ogni tratto [s] (>= 0)
+        """
+        waypoints = np.asarray(waypoints, dtype=float)
+        if waypoints.ndim != 2 or waypoints.shape[1] != 3 or len(waypoints) < 2:
+            raise ValueError("waypoints must be of shape (S + 1, 3) with S >= 1")
+
+        segment_durations = np.broadcast_to(np.asarray(segment_durations, dtype=float), (len(waypoints) - 1,))
+        if np.any(segment_durations < 0):
+            raise ValueError("segment durations must be non-negative")
+
+        breakpoints = np.concatenate([[0.0], np.cumsum(segment_durations)])
+        coefficients = minimum_jerk_coefficients(waypoints[:-1], waypoints[1:])     # (S, 3, 6)
+        return cls(breakpoints, coefficients, start_time)
+
+    @property
+    def num_segments(self):
+        """Numero di segmenti (inclusi quelli di lunghezza nulla)."""
+        return len(self.coefficients)
+
+    def segment_index(self, local_t):
+        """
+        Segmento attivo per ogni tempo locale (già saturato in [0, duration]), con ricerca binaria.
+        """
+        k = np.searchsorted(self._segment_starts, local_t, side='right') - 1
+        return self._segments[np.clip(k, 0, len(self._segments) - 1)]
+
+    def _evaluate(self, t, order):
+        """Valuta la derivata order-esima (0 = posizione) al tempo globale t: (3,) o (T, 3)."""
+        t_arr = np.asarray(t, dtype=float)
+        local_t = np.clip(t_arr - self.start_time, 0.0, self.duration)
+
+        seg = self.segment_index(local_t)
+        tau = np.clip((local_t - self.breakpoints[seg]) / self._lengths[seg], 0.0, 1.0)
+        values = polyval_normalized(self.coefficients[seg], tau[..., None], order=order)
+        if order > 0:
+            values = values / (self._lengths[seg] ** order)[..., None]
+        return values
+
+    def position(self, t):
+        """
+        Posizione al tempo globale t (scalare o array). Prima della partenza e dopo la fine il drone è fermo.
+
+        :return: array (3,) se t è scalare, altrimenti (T, 3)
+        """
+        return self._evaluate(t, 0)
+
+    def derivative(self, t, order=1):
+        """
+        Derivata order-esima al tempo globale t; nulla fuori dall'intervallo [start_time, start_time + duration].
+
+        :return: array (3,) se t è scalare, altrimenti (T, 3)
+        """
+        t_arr = np.asarray(t, dtype=float)
+        values = self._evaluate(t_arr, order)
+        moving = (t_arr >= self.start_time) & (t_arr <= self.start_time + self.duration)
+        return np.where(moving[..., None], values, 0.0)
+
+    def velocity(self, t):
+        """Velocità al tempo globale t (scalare -> (3,), array -> (T, 3))."""
+        return self.derivative(t, 1)
+
+    def acceleration(self, t):
+        """Accelerazione al tempo globale t (scalare -> (3,), array -> (T, 3))."""
+        return self.derivative(t, 2)
+
+    def jerk(self, t):
+        """Jerk al tempo globale t (scalare -> (3,), array -> (T, 3))."""
+        return self.derivative(t, 3)
+
+    def sample(self, num_points):
+        """
+        Campiona la traiettoria in num_points istanti uniformi in [0, duration], come Trajectory.sample.
+
+        :return: (times (num_points,), positions (num_points, 3))
+        """
+        times = np.linspace(0.0, self.duration, num_points)
+        return times, self.position(times)
+
+    # Rappresentazione leggibile in STRINGA
+    def __repr__(self):
+        return (f"PiecewiseTrajectory(segments={self.num_segments}, degree={self.coefficients.shape[2] - 1}, "
+                f"duration={self.duration}s)")
@@ -3,12 +3,18 @@ import yaml
 import numpy as np
 from typing import List, Dict
 from models.drone import Drone
+from models.piecewise_trajectory import PiecewiseTrajectory
+from models.swarm import Swarm
 from core.formation_generator import circle_formation_normal, sphere_formation, spiral_formation, star_formation, line_formation, heart_formation, number_formation, helix_formation, pyramid_formation, cube_formation, grid_formation, wave_formation
 from core.trajectory_generator import generate_trajectories
-from core.assignment_solver import assign_drones_to_targets
+from core.assignment_solver import assign_drones_to_targets, assign_drones_to_targets_incremental
+from core.assignment_cache import AssignmentCache
+from core.formation_alignment import align_formation
 from core.trajectory_validator import check_constraints_and_collisions
+from core.closest_approach import polynomial_pieces
 from core.trajectory_postprocessor import (
     time_scale_trajectories,
+    time_scale_chain,
     resolve_collisions_with_start_delays_me
 )
 
@@ -16,6 +22,7 @@ from core.trajectory_postprocessor import (
 class ShowSequencer:
     def __init__(self, yaml_path: str, drones: List[Drone]):
         self.drones = drones
+        self.swarm = Swarm.from_drones(drones)     # stessi droni in forma di array contigui
         self.sequences = []
         self.trajectories = []
         self.durations = []
@@ -24,6 +31,44 @@ class ShowSequencer:
         with open(yaml_path, 'r') as f:
             self.config = yaml.safe_load(f)
 
+        # Opzioni del solver di assegnazione (es. {'method': 'sparse', 'k_nearest': 16})
+        self.assignment_options = dict(self.config.get('assignment') or {})
+
+        # Cache su disco delle assegnazioni: attiva solo se è indicata una cache_dir
+        cache_dir = self.assignment_options.pop('cache_dir', None)
+        cache_max_mb = self.assignment_options.pop('cache_max_mb', 64)
+        self.assignment_cache = (
+            AssignmentCache(cache_dir, max_bytes=int(cache_max_mb * 1024 * 1024))
+            if cache_dir else None
+        )
+
+        # Riassegnazione incrementale: ricostruendo lo show dopo una modifica si riparano le soluzioni
+        # precedenti invece di risolvere da zero (solo per il metodo 'dense'; non usa la cache su disco)
+        self.incremental_assignment = bool(self.assignment_options.pop('incremental', False))
+        self.assignment_states = {}
+
+        # Calcolo della durata delle transizioni: 'analytic' (forma chiusa) o 'sampling' (campionamento)
+        self.time_scaling_method = self.config.get('time_scaling', 'analytic')
+
+        # Temporizzazione di default delle transizioni (sovrascrivibile per sequenza con la chiave 'timing'):
+        # {'mode': 'swarm' | 'per_drone', 'align': 'arrival' | 'departure'}
+        self.timing = dict(self.config.get('timing') or {})
+
+        # Profilo di moto delle transizioni: 'minimum_jerk' (default) o 'scurve' (richiede max_jerk [m/s^3])
+        self.trajectory_options = {
+            'profile': self.config.get('trajectory_type', 'minimum_jerk'),
+            'max_jerk': self.config.get('max_jerk'),
+        }
+
+        # Transizioni continue in velocità: i passi consecutivi con hold_duration 0 formano una catena di quintiche
+        # che attraversa i target intermedi senza fermarsi (il profilo non si applica alle catene; i passi con
+        # timing per drone e quelli con collisioni restano transizioni da fermo a fermo)
+        self.velocity_continuous = bool(self.config.get('velocity_continuous', False))
+
+        # Opzioni del controllo collisioni (es. {'method': 'auto', 'broad_phase_min_drones': 500}):
+        # con 'auto' gli sciami grandi usano la broad phase con KD-tree invece di tutte le coppie
+        self.collision_options = dict(self.config.get('collision_check') or {})
+
         # Mappa tipo formazione -> funzione generatrice
         self.formation_generators = {
             'circle': self._generate_circle,
@@ -146,7 +191,14 @@ class ShowSequencer:
 
     def build_show(self):
         """Costruisce l'intera sequenza dello show dalla configurazione YAML"""
-        current_positions = {d.drone_id: d.initial_position for d in self.drones}
+        # Una nuova build riparte da zero (es. dopo aver modificato self.config)
+        self.sequences = []
+        self.trajectories = []
+        self.durations = []
+        self.cumulative_times = [0.0]
+
+        current_positions = self.swarm.positions.copy()     # (N, 3) nell'ordine di self.swarm.drone_ids
+        chain = []      # passi consecutivi senza hold in attesa (solo con velocity_continuous)
 
         for seq_idx, sequence in enumerate(self.config['sequences']):
             print(f"\n=== Sequenza {seq_idx + 1}/{len(self.config['sequences'])} ===")
@@ -161,67 +213,173 @@ class ShowSequencer:
             formation = self.formation_generators[formation_type](formation_params)
             print(f"  Formazione: {formation_type}")
 
-            # 2. Crea droni temporanei con posizioni correnti
-            temp_drones = [
-                Drone(d.drone_id, current_positions[d.drone_id],
-                      d.max_velocity, d.max_acceleration)
-                for d in self.drones
-            ]
+            # 1b. Allineamento opzionale (yaw + traslazione limitata) verso le posizioni correnti
+            # align: true usa le opzioni di default, un dizionario le sovrascrive
+            align_options = sequence.get('align')
+            if align_options is True:
+                align_options = {}
+            elif align_options is False:
+                align_options = None
+            elif align_options is not None and not isinstance(align_options, dict):
+                raise ValueError(f"Opzione 'align' della sequenza {seq_idx + 1} non valida: "
+                                 f"atteso true/false o un dizionario, trovato {align_options!r}")
+            if align_options is not None:
+                formation, align_info = align_formation(
+                    formation, current_positions,
+                    assignment_options=self.assignment_options, **align_options
+                )
+                print(f"  Allineamento: yaw={np.degrees(align_info['yaw']):.1f}°, "
+                      f"offset={np.round(align_info['offset'], 2)}, "
+                      f"costo {align_info['initial_cost']:.2f} -> {align_info['cost']:.2f}")
+
+            # 2. Sciame dello step: stessi id e limiti, posizioni correnti
+            step_swarm = self.swarm.with_positions(current_positions)
 
             # 3. Assegna droni ai target
-            assignment = assign_drones_to_targets(temp_drones, formation)
-
-            # 4. Genera e scala traiettorie per la transizione
-            transition_duration = sequence['transition_duration']
-            trajectories, actual_duration = time_scale_trajectories(
-                temp_drones, assignment, transition_duration
-            )
-            print(f"  Transition duration: {actual_duration:.2f}s")
-
-            # 5. Risolvi collisioni
-            trajectories, _ = resolve_collisions_with_start_delays_me(
-                trajectories, self.drones
-            )
-
-            # 6. Valida traiettorie
-            validation = check_constraints_and_collisions(trajectories, self.drones)
-            print(f"  Validazione: dinamica={validation['dynamic_ok']}, "
-                  f"collisioni={validation['swarm_ok']}")
-
-            if not (validation['dynamic_ok'] and validation['swarm_ok']):
-                print(f"  ⚠️ ATTENZIONE: Sequenza {seq_idx + 1} non valida!")
-
-            # 7. Salva hold duration
-            hold_duration = sequence.get('hold_duration', 0.0)
-            print(f"  Hold duration: {hold_duration:.2f}s")
-
-            # 8. Memorizza tutte le info della sequenza
-            self.sequences.append({
+            if self.incremental_assignment and self.assignment_options.get('method', 'dense') == 'dense':
+                assignment, self.assignment_states[seq_idx] = assign_drones_to_targets_incremental(
+                    step_swarm, formation, self.assignment_states.get(seq_idx)
+                )
+            else:
+                assignment = assign_drones_to_targets(
+                    step_swarm, formation, cache=self.assignment_cache, **self.assignment_options
+                )
+
+            step = {
+                'seq_idx': seq_idx,
+                'sequence': sequence,
                 'formation': formation,
+                'type': formation_type,
+                'swarm': step_swarm,
                 'assignment': assignment,
-                'trajectories': trajectories,
-                'transition_duration': actual_duration,
-                'hold_duration': hold_duration,
-                'type': formation_type
-            })
-
-            total_seq_duration = actual_duration + hold_duration
-            self.durations.append(total_seq_duration)
-            self.cumulative_times.append(
-                self.cumulative_times[-1] + total_seq_duration
-            )
-
-            # 9. Aggiorna posizioni correnti per la prossima sequenza
-            for d in self.drones:
-                current_positions[d.drone_id] = trajectories[d.drone_id].position(
-                    actual_duration
-                )
+            }
+            # i passi senza hold restano in attesa del successivo: la catena viene generata tutta insieme
+            if self._chainable(sequence):
+                chain.append(step)
+                is_last = seq_idx == len(self.config['sequences']) - 1
+                if sequence.get('hold_duration', 0.0) != 0 or is_last:
+                    self._build_chain(chain)
+                    chain = []
+            else:
+                # una catena in attesa termina da ferma prima di questo passo
+                if chain:
+                    self._build_chain(chain)
+                    chain = []
+                self._build_rest_to_rest_step(step)
+
+            # 9. Aggiorna posizioni correnti per la prossima sequenza (ogni traiettoria termina sul target assegnato)
+            current_positions = step_swarm.gather(assignment)
 
         print(f"\n=== Show completo ===")
         print(f"Durata totale: {self.get_total_duration():.2f}s")
 
         return self.get_total_duration()
 
+    def _build_rest_to_rest_step(self, step):
+        """Transizione di un singolo passo da fermo a fermo: time scaling, ritardi anti-collisione, validazione."""
+        sequence = step['sequence']
+
+        # 4. Genera e scala traiettorie per la transizione
+        transition_duration = sequence['transition_duration']
+        timing = {**self.timing, **(sequence.get('timing') or {})}
+        trajectories, actual_duration = time_scale_trajectories(
+            step['swarm'], step['assignment'], transition_duration, method=self.time_scaling_method,
+            **timing, **self.trajectory_options
+        )
+        print(f"  Transition duration: {actual_duration:.2f}s")
+
+        # 5. Risolvi collisioni
+        trajectories, _ = resolve_collisions_with_start_delays_me(
+            trajectories, self.drones
+        )
+
+        # i ritardi di partenza possono spostare un arrivo oltre la finestra: la transizione li deve contenere
+        actual_duration = max(actual_duration,
+                              max(traj.start_time + traj.duration for traj in trajectories.values()))
+
+        self._store_step(step, trajectories, actual_duration)
+
+    def _chainable(self, sequence):
+        """
+        Un passo entra in una catena continua in velocità solo con velocity_continuous e timing di sciame:
+        con il timing per drone ogni drone ha la propria finestra, incompatibile con la catena.
+        """
+        timing = {**self.timing, **(sequence.get('timing') or {})}
+        return self.velocity_continuous and timing.get('mode', 'swarm') == 'swarm'
+
+    def _build_chain(self, steps):
+        """
+        Catena di passi consecutivi senza hold: quintiche continue in velocità e accelerazione, con un unico
+        riscalamento uniforme delle durate. I ritardi di partenza romperebbero la continuità: non vengono applicati.
+        Per questo, se un passo della catena ha collisioni, la catena viene spezzata: quel passo diventa una
+        transizione da fermo a fermo (con i ritardi anti-collisione) e i passi prima e dopo vengono ricostruiti
+        come catene separate.
+        """
+        if len(steps) == 1:
+            self._build_rest_to_rest_step(steps[0])
+            return
+
+        first = steps[0]
+        waypoints = np.stack([first['swarm'].positions] + [step['swarm'].gather(step['assignment'])
+                                                             for step in steps])
+        requested = [step['sequence']['transition_duration'] for step in steps]
+
+        chain_trajectories, durations = time_scale_chain(first['swarm'], waypoints, requested)
+        validations = [check_constraints_and_collisions(trajectories, self.drones, **self.collision_options)
+                       for trajectories in chain_trajectories]
+
+        conflict = next((k for k, validation in enumerate(validations) if not validation['swarm_ok']), None)
+        if conflict is not None:
+            print(f"  Catena (sequenze {first['seq_idx'] + 1}-{steps[-1]['seq_idx'] + 1}) con collisioni nella "
+                  f"sequenza {steps[conflict]['seq_idx'] + 1}: transizione da fermo a fermo")
+            if conflict > 0:
+                self._build_chain(steps[:conflict])
+            self._build_rest_to_rest_step(steps[conflict])
+            if conflict + 1 < len(steps):
+                self._build_chain(steps[conflict + 1:])
+            return
+
+        print(f"  Catena continua di {len(steps)} passi (sequenze {first['seq_idx'] + 1}-{steps[-1]['seq_idx'] + 1})")
+
+        for step, trajectories, duration, validation in zip(steps, chain_trajectories, durations, validations):
+            print(f"  [Sequenza {step['seq_idx'] + 1}] Transition duration: {duration:.2f}s")
+            self._store_step(step, trajectories, float(duration), validation)
+
+    def _store_step(self, step, trajectories, actual_duration, validation=None):
+        """
+        Valida le traiettorie di un passo (se non già validate, es. in una catena) e lo aggiunge allo show.
+        """
+        sequence = step['sequence']
+
+        # 6. Valida traiettorie
+        if validation is None:
+            validation = check_constraints_and_collisions(trajectories, self.drones, **self.collision_options)
+        print(f"  Validazione: dinamica={validation['dynamic_ok']}, "
+              f"collisioni={validation['swarm_ok']}")
+
+        if not (validation['dynamic_ok'] and validation['swarm_ok']):
+            print(f"  ⚠️ ATTENZIONE: Sequenza {step['seq_idx'] + 1} non valida!")
+
+        # 7. Salva hold duration
+        hold_duration = sequence.get('hold_duration', 0.0)
+        print(f"  Hold duration: {hold_duration:.2f}s")
+
+        # 8. Memorizza tutte le info della sequenza
+        self.sequences.append({
+            'formation': step['formation'],
+            'assignment': step['assignment'],
+            'trajectories': trajectories,
+            'transition_duration': actual_duration,
+            'hold_duration': hold_duration,
+            'type': step['type']
+        })
+
+        total_seq_duration = actual_duration + hold_duration
+        self.durations.append(total_seq_duration)
+        self.cumulative_times.append(
+            self.cumulative_times[-1] + total_seq_duration
+        )
+
     def get_total_duration(self) -> float:
         """Ritorna la durata totale dello show"""
         return self.cumulative_times[-1]
@@ -250,6 +408,77 @@ class ShowSequencer:
             last_seq['transition_duration']
         )
 
+    def _sequence_indices(self, times: np.ndarray) -> np.ndarray:
+        """
+        Indice della sequenza attiva per ogni tempo globale; -1 fuori dallo show
+        (prima dell'inizio o dalla fine in poi).
+        """
+        idx = np.searchsorted(self.cumulative_times, times, side='right') - 1
+        idx[(idx < 0) | (idx >= len(self.sequences))] = -1
+        return idx
+
+    def get_positions(self, drone_id: int, times) -> np.ndarray:
+        """
+        Versione vettorizzata di get_position: posizioni (T, 3) di un drone ai tempi globali times.
+        Ogni sequenza viene valutata con un'unica chiamata Trajectory.position sull'array di tempi.
+        """
+        times = np.asarray(times, dtype=float)
+        idx = self._sequence_indices(times)
+
+        # di default (oltre la fine) il drone resta nell'ultima posizione
+        last_seq = self.sequences[-1]
+        positions = np.tile(
+            last_seq['trajectories'][drone_id].position(last_seq['transition_duration']), (len(times), 1)
+        )
+
+        for i, seq in enumerate(self.sequences):
+            mask = idx == i
+            if not np.any(mask):
+                continue
+            # durante l'hold il tempo locale viene saturato alla fine della transizione
+            local_t = np.minimum(times[mask] - self.cumulative_times[i], seq['transition_duration'])
+            positions[mask] = seq['trajectories'][drone_id].position(local_t)
+
+        return positions
+
+    def build_drone_track(self, drone_id: int) -> PiecewiseTrajectory:
+        """
+        Unisce tutte le sequenze dello show di un drone in un'unica PiecewiseTrajectory sul tempo globale:
+        attese prima della partenza, transizioni e hold diventano segmenti consecutivi.
+        Valutarla equivale a get_position/get_velocity, ma con una ricerca binaria invece della scansione
+        di self.sequences.
+        """
+        if not self.sequences:
+            raise ValueError("The show has not been built yet")
+
+        breakpoints = [0.0]
+        pieces = []
+
+        def hold_until(t_end, position):
+            # segmento costante (drone fermo) fino a t_end
+            if t_end > breakpoints[-1]:
+                pieces.append(np.asarray(position, dtype=float)[None, :, None])
+                breakpoints.append(t_end)
+
+        for i, seq in enumerate(self.sequences):
+            traj = seq['trajectories'][drone_id]
+            t_start = self.cumulative_times[i] + traj.start_time
+
+            hold_until(t_start, traj.position(traj.start_time))
+            local_breakpoints, coefficients = polynomial_pieces(traj)
+            pieces.extend(coefficients[k][None] for k in range(len(coefficients)))
+            breakpoints.extend(t_start + local_breakpoints[1:])
+
+            hold_until(self.cumulative_times[i + 1], traj.position(traj.start_time + traj.duration))
+
+        # stesso grado per tutti i segmenti: padding con coefficienti nulli
+        K = max(piece.shape[2] for piece in pieces)
+        coefficients = np.zeros((len(pieces), 3, K))
+        for k, piece in enumerate(pieces):
+            coefficients[k, :, :piece.shape[2]] = piece[0]
+
+        return PiecewiseTrajectory(breakpoints, coefficients)
+
     def get_all_formations(self) -> List[np.ndarray]:
         """Ritorna tutte le formazioni target per visualizzazione"""
         return [seq['formation'].target_positions for seq in self.sequences]
@@ -277,3 +506,20 @@ class ShowSequencer:
 
         # Se siamo oltre la fine: fermo
         return np.zeros(3)
+
+    def get_velocities(self, drone_id: int, times) -> np.ndarray:
+        """
+        Versione vettorizzata di get_velocity: velocità (T, 3) di un drone ai tempi globali times.
+        Nulla durante gli hold e fuori dallo show.
+        """
+        times = np.asarray(times, dtype=float)
+        idx = self._sequence_indices(times)
+        velocities = np.zeros((len(times), 3))
+
+        for i, seq in enumerate(self.sequences):
+            local_t = times - self.cumulative_times[i]
+            mask = (idx == i) & (local_t <= seq['transition_duration'])
+            if np.any(mask):
+                velocities[mask] = seq['trajectories'][drone_id].velocity(local_t[mask])
+
+        return velocities
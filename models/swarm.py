@@ -0,0 +1,110 @@
+import numpy as np
+
+from models.drone import Drone
+
+
+class Swarm:
+    """
+    Sciame di droni in forma "structure of arrays".
+
+    Invece di una lista di oggetti Drone si conservano array contigui, nello stesso ordine:
+        - drone_ids:        (N,)
+        - positions:        (N, 3)  posizioni (iniziali per lo step corrente)
+        - max_velocity:     (N,)
+        - max_acceleration: (N,)
+    più una mappa id -> indice. Le funzioni del core leggono direttamente gli array, senza ricostruirli
+    drone per drone; iterando su uno Swarm si ottengono comunque oggetti Drone, per il codice che li usa.
+    """
+
+    # costruttore
+    def __init__(self, drone_ids, positions, max_velocity, max_acceleration):
+        """
+        :param drone_ids: sequenza di N id
+        :param positions: array-like (N, 3)
+        :param max_velocity: array-like (N,) o scalare
+        :param max_acceleration: array-like (N,) o scalare
+        """
+        self.drone_ids = np.asarray(drone_ids)
+        self.positions = np.ascontiguousarray(positions, dtype=float)
+        N = len(self.drone_ids)
+
+        if self.positions.shape != (N, 3):
+            raise ValueError("positions must be of shape (N, 3)")
+
+        self.max_velocity = np.array(np.broadcast_to(np.asarray(max_velocity, dtype=float), (N,)))
+        self.max_acceleration = np.array(np.broadcast_to(np.asarray(max_acceleration, dtype=float), (N,)))
+
+        self._index = {did: i for i, did in enumerate(self.drone_ids.tolist())}     # mappa id -> riga
+        if len(self._index) != N:
+            raise ValueError("drone ids must be unique")
+
+    @classmethod
+    def from_drones(cls, drones):
+        """Costruisce lo sciame da una lista di oggetti Drone (gather fatto una sola volta)."""
+        return cls(
+            [d.drone_id for d in drones],
+            np.array([d.initial_position for d in drones], dtype=float).reshape(-1, 3),
+            [d.max_velocity for d in drones],
+            [d.max_acceleration for d in drones],
+        )
+
+    def with_positions(self, positions):
+        """
+        Stesso sciame (id e limiti condivisi, non copiati) con nuove posizioni, es. all'inizio di uno step.
+
+        :param positions: array-like (N, 3) nell'ordine di drone_ids
+        """
+        swarm = Swarm.__new__(Swarm)
+        swarm.drone_ids = self.drone_ids
+        swarm.max_velocity = self.max_velocity
+        swarm.max_acceleration = self.max_acceleration
+        swarm._index = self._index
+        swarm.positions = np.ascontiguousarray(positions, dtype=float)
+
+        if swarm.positions.shape != self.positions.shape:
+            raise ValueError("positions must be of shape (N, 3)")
+        return swarm
+
+    @property
+    def size(self):
+        """Numero di droni."""
+        return len(self.drone_ids)
+
+    def __len__(self):
+        return self.size
+
+    def index_of(self, drone_id):
+        """Riga corrispondente a drone_id."""
+        return self._index[drone_id]
+
+    def gather(self, values):
+        """
+        Raccoglie in un array, nell'ordine dello sciame, i valori di un dict {drone_id: valore}
+        (es. un'assegnazione {drone_id: target_position} -> array (N, 3)).
+        """
+        return np.array([values[did] for did in self.drone_ids.tolist()], dtype=float)
+
+    def drone(self, i):
+        """Oggetto Drone della riga i."""
+        return Drone(self.drone_ids[i].item(), self.positions[i].copy(),
+                     float(self.max_velocity[i]), float(self.max_acceleration[i]))
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.drone(i)
+
+    def to_drones(self):
+        """Lista di oggetti Drone equivalente."""
+        return list(self)
+
+    # Rappresentazione leggibile in STRINGA
+    def __repr__(self):
+        return f"Swarm(num_drones={self.size})"
+
+
+def as_swarm(drones):
+    """
+    Ritorna drones se è già uno Swarm, altrimenti lo costruisce da una lista di oggetti Drone.
+    Permette alle funzioni del core di accettare entrambe le forme.
+    """
+    return drones if isinstance(drones, Swarm) else Swarm.from_drones(drones)
@@ -0,0 +1,148 @@
+import numpy as np
+
+from models.trajectory import Trajectory
+from utils.math_tools import minimum_jerk_coefficients, polyval_normalized, polynomial_3d
+
+
+class SwarmTrajectory:
+    """
+    Traiettorie polinomiali di TUTTO lo sciame memorizzate in array contigui.
+
+    Invece di un oggetto Trajectory (con le sue closure) per ogni drone, si conservano:
+        - drone_ids:    (N,)       id dei droni, nello stesso ordine delle righe
+        - coefficients: (N, 3, K)  coefficienti in potenze crescenti del tempo normalizzato tau in [0, 1]
+                                   (K = 6 per le quintiche minimum jerk)
+        - durations:    (N,)       durata della traiettoria di ogni drone [s]
+        - start_times:  (N,)       istante di partenza di ogni drone [s]
+
+    Prima di start_time il drone è fermo nella posizione iniziale, dopo start_time + duration in quella finale,
+    come in Trajectory.position. Tutti i droni vengono valutati in un'unica chiamata vettorizzata.
+    """
+
+    # costruttore
+    def __init__(self, drone_ids, coefficients, durations, start_times=None):
+        """
+        :param drone_ids: sequenza di N id
+        :param coefficients: array-like (N, 3, K)
+        :param durations: array-like (N,) o scalare
+        :param start_times: array-like (N,) o scalare (default 0)
+        """
+        self.drone_ids = np.asarray(drone_ids)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+        N = len(self.drone_ids)
+
+        if self.coefficients.ndim != 3 or self.coefficients.shape[:2] != (N, 3):
+            raise ValueError("coefficients must be of shape (N, 3, K)")
+
+        # copie scrivibili: start_times viene modificato dalla risoluzione delle collisioni
+        self.durations = np.array(np.broadcast_to(np.asarray(durations, dtype=float), (N,)))
+        self.start_times = np.array(np.broadcast_to(np.asarray(0.0 if start_times is None else start_times,
+                                                               dtype=float), (N,)))
+
+        if np.any(self.durations <= 0):
+            raise ValueError("Trajectory duration must be positive")
+
+        self._index = {did: i for i, did in enumerate(self.drone_ids.tolist())}     # mappa id -> riga
+
+    @classmethod
+    def from_minimum_jerk(cls, drone_ids, start_positions, end_positions, durations, start_times=None):
+        """
+        Costruisce le quintiche minimum jerk di tutti i droni in un colpo solo.
+
+        :param start_positions: array-like (N, 3)
+        :param end_positions: array-like (N, 3)
+        :param durations: array-like (N,) o scalare
+        """
+        coefficients = minimum_jerk_coefficients(start_positions, end_positions)
+        return cls(drone_ids, coefficients, durations, start_times)
+
+    @property
+    def size(self):
+        """Numero di droni."""
+        return len(self.drone_ids)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def end_time(self):
+        """Istante globale in cui l'ultimo drone termina la traiettoria."""
+        return float(np.max(self.start_times + self.durations)) if self.size else 0.0
+
+    def index_of(self, drone_id):
+        """Riga corrispondente a drone_id."""
+        return self._index[drone_id]
+
+    def _normalized_time(self, t):
+        """tau (T, N) saturato in [0, 1] per i tempi globali t (T,)."""
+        return np.clip((t[:, None] - self.start_times) / self.durations, 0.0, 1.0)
+
+    def positions(self, t):
+        """
+        Posizioni di tutti i droni al/ai tempo/i globale/i t.
+
+        :param t: scalare o array-like (T,)
+        :return: array (N, 3) se t è scalare, altrimenti (T, N, 3)
+        """
+        t_arr = np.atleast_1d(np.asarray(t, dtype=float))
+        tau = self._normalized_time(t_arr)                             # (T, N)
+        pos = polyval_normalized(self.coefficients, tau[:, :, None])  # (T, N, 3)
+        return pos[0] if np.ndim(t) == 0 else pos
+
+    def position(self, drone_id, t):
+        """
+        Posizione di un singolo drone al/ai tempo/i globale/i t.
+
+        :return: array (3,) se t è scalare, altrimenti (T, 3)
+        """
+        i = self.index_of(drone_id)
+        t_arr = np.atleast_1d(np.asarray(t, dtype=float))
+        tau = np.clip((t_arr - self.start_times[i]) / self.durations[i], 0.0, 1.0)
+        pos = polyval_normalized(self.coefficients[i], tau[:, None])   # (T, 3)
+        return pos[0] if np.ndim(t) == 0 else pos
+
+    def derivatives(self, t, order=1):
+        """
+        Derivata order-esima (rispetto al tempo) di tutti i droni al/ai tempo/i globale/i t, in forma chiusa.
+        Fuori dall'intervallo [start_time, start_time + duration] il drone è fermo: derivate nulle.
+
+        :return: array (N, 3) se t è scalare, altrimenti (T, N, 3)
+        """
+        t_arr = np.atleast_1d(np.asarray(t, dtype=float))
+        local = t_arr[:, None] - self.start_times                      # (T, N)
+        tau = np.clip(local / self.durations, 0.0, 1.0)
+        values = polyval_normalized(self.coefficients, tau[:, :, None], order=order) / (self.durations ** order)[:, None]
+        moving = (local >= 0.0) & (local <= self.durations)
+        values = np.where(moving[:, :, None], values, 0.0)
+        return values[0] if np.ndim(t) == 0 else values
+
+    def velocities(self, t):
+        """Velocità di tutti i droni: (N, 3) o (T, N, 3)."""
+        return self.derivatives(t, 1)
+
+    def accelerations(self, t):
+        """Accelerazioni di tutti i droni: (N, 3) o (T, N, 3)."""
+        return self.derivatives(t, 2)
+
+    def jerks(self, t):
+        """Jerk di tutti i droni: (N, 3) o (T, N, 3)."""
+        return self.derivatives(t, 3)
+
+    def end_positions(self):
+        """Posizioni finali (N, 3): somma dei coefficienti (tau = 1)."""
+        return self.coefficients.sum(axis=2)
+
+    def to_trajectories(self):
+        """
+        Converte in dizionario {drone_id: Trajectory}, per le funzioni che lavorano drone per drone.
+        """
+        return {
+            did: Trajectory(self.durations[i], polynomial_3d(self.coefficients[i], self.durations[i]),
+                            start_time=float(self.start_times[i]))
+            for i, did in enumerate(self.drone_ids.tolist())
+        }
+
+    # Rappresentazione leggibile in STRINGA
+    def __repr__(self):
+        return (f"SwarmTrajectory(num_drones={self.size}, degree={self.coefficients.shape[2] - 1}, "
+                f"end_time={self.end_time:.2f}s)")
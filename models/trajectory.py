@@ -1,5 +1,7 @@
 import numpy as np
 
+from utils.math_tools import numerical_derivative
+
 
 class Trajectory:
     """
@@ -12,13 +14,20 @@ class Trajectory:
     Viene definita una traiettoria 3D continua nel tempo come funzione di posizione x(t),y(t),z(t).
     E' volutamente agnostica rispetto al controllore e simulatore: fornusce solo posizioni nel tempo senza imporre
     come venga generata.
+
+    Protocollo derivata: se position_function espone un attributo derivative(t, order) (come le funzioni di
+    utils.math_tools.minimum_jerk_3d e polynomial_3d), velocity/acceleration/jerk lo usano in forma chiusa;
+    altrimenti le derivate vengono stimate con differenze finite centrali.
     """
 
     # costruttore
     def __init__(self, duration, position_function, start_time=0.0):
         """
         :param duration: durata totale [s]
-        :param position_function: callable f(t) -> np.ndarray shape (3,)
+        :param position_function: callable f(t) -> np.ndarray shape (3,); se espone l'attributo
+                                  f.vectorized = True (come minimum_jerk_3d e polynomial_3d) accetta anche un
+                                  array di tempi, ritornando (..., 3), e position(t) viene valutata in un'unica
+                                  chiamata; altrimenti viene chiamata campione per campione
 
         La classe non impone come costruisci position_function: può essere una spline, un polinomio, un'interpolazione
         per waypoints o anche una funzione analitica.
@@ -30,31 +39,79 @@ class Trajectory:
         if self.duration <= 0:
             raise ValueError("Trajectory duration must be positive")
 
-    def position(self, t):
+    @property
+    def coefficients(self):
+        """
+        Coefficienti (3, K) nel tempo normalizzato tau = t_locale / duration, se la funzione di posizione
+        è polinomiale e li espone (minimum_jerk_3d, polynomial_3d); altrimenti None.
         """
-        Valuta la traiettoria al tempo globale t.
-        Tiene conto di start_time.
+        return getattr(self._position_function, "coefficients", None)
+
+    def position(self, t):
         """
+        Valuta la traiettoria al tempo globale t (scalare o array di tempi).
+        Tiene conto di start_time: prima della partenza il drone è fermo all'inizio, dopo la fine è fermo alla fine.
 
-        # 1. Prima della partenza → fermo all'inizio
-        if t < self.start_time:
-            local_t = 0.0
+        :return: array (3,) se t è scalare, altrimenti (T, 3)
+        """
+        t_arr = np.asarray(t, dtype=float)
+        local_t = np.clip(t_arr - self.start_time, 0.0, self.duration)     # saturazione vettorizzata
 
-        # 2. Dopo la fine → fermo alla fine
-        elif t > self.start_time + self.duration:
-            local_t = self.duration
+        expected_shape = t_arr.shape + (3,)
 
-        # 3. Durante la traiettoria
+        if t_arr.ndim == 0:
+            pos = np.asarray(self._position_function(float(local_t)), dtype=float)
+        elif getattr(self._position_function, "vectorized", False):
+            pos = np.asarray(self._position_function(local_t), dtype=float)
         else:
-            local_t = t - self.start_time
-
-        pos = np.asarray(self._position_function(local_t), dtype=float)
+            # funzioni di posizione solo scalari: valutazione campione per campione
+            pos = np.array([np.asarray(self._position_function(tt), dtype=float) for tt in local_t.ravel()])
+            if pos.shape == (local_t.size, 3):
+                pos = pos.reshape(expected_shape)
 
-        if pos.shape != (3,):
+        if pos.shape != expected_shape:
             raise ValueError("Position function must return a 3D vector")
 
         return pos
 
+    def derivative(self, t, order=1):
+        """
+        Derivata order-esima della posizione al tempo globale t (scalare o array).
+        Prima della partenza e dopo la fine il drone è fermo: tutte le derivate sono nulle.
+
+        :return: array (3,) se t è scalare, altrimenti (T, 3)
+        """
+        t_arr = np.asarray(t, dtype=float)
+        local_t = np.clip(t_arr - self.start_time, 0.0, self.duration)
+
+        analytic = getattr(self._position_function, "derivative", None)
+        if analytic is not None:
+            values = np.asarray(analytic(local_t, order), dtype=float)
+        else:
+            # fallback generico: differenze finite centrali ripetute sulla funzione di posizione
+            # (passo più ampio per ordini alti, altrimenti la cancellazione numerica domina)
+            df = self._position_function
+            step = self.duration * 1e-4 ** (1.0 / max(order, 1))
+            for _ in range(order):
+                df = numerical_derivative(df, dt=step)
+            values = np.array([np.asarray(df(tt), dtype=float) for tt in np.atleast_1d(local_t)])
+            values = values.reshape(np.shape(local_t) + (3,))
+
+        moving = (t_arr >= self.start_time) & (t_arr <= self.start_time + self.duration)
+        return np.where(moving[..., None], values, 0.0)
+
+    def velocity(self, t):
+        """Velocità al tempo globale t (scalare -> (3,), array -> (T, 3))."""
+        return self.derivative(t, 1)
+
+    def acceleration(self, t):
+        """Accelerazione al tempo globale t (scalare -> (3,), array -> (T, 3))."""
+        return self.derivative(t, 2)
+
+    def jerk(self, t):
+        """Jerk al tempo globale t (scalare -> (3,), array -> (T, 3))."""
+        return self.derivative(t, 3)
+
     def sample(self, num_points):
         """
         Campiona la traiettoria in num_points istanti.
@@ -66,7 +123,7 @@ class Trajectory:
         -positions: array shape (num_points,3)
         """
         times = np.linspace(0.0, self.duration, num_points)
-        positions = np.array([self.position(t) for t in times])
+        positions = self.position(times)
         return times, positions
 
     # Rappresentazione leggibile in STRINGA
@@ -86,7 +143,12 @@ _init_(duration, position_function):
 position(t):
     .Ti da la posizione al tempo t
     .Se chiedi un tempo fuori dalla durata (tipo t=-3 o t=100), lo satura
+    .Accetta anche un array di tempi: una sola chiamata ritorna tutte le posizioni (T, 3)
     .Controlla che la tua funzione ritorni esattamente un vettore 3D (shape (3,)) se no errore
+
+velocity(t) / acceleration(t) / jerk(t):
+    .Derivate in forma chiusa se la funzione di posizione le fornisce, altrimenti differenze finite
+    .Accettano anche un array di tempi
     
 sample(num_points):
     .Campiona la traiettoria: sceglie num_points tempi equidisatanti tra 0 e duration e ti restituisce:
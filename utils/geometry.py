@@ -51,3 +51,70 @@ def rotate(points, rotation_matrix):
     R = np.asarray(rotation_matrix, dtype=float)
 
     return points @ R.T
+
+
+def segment_distances(p0, p1, q0, q1, eps=1e-12):
+    """
+    Distanza minima tra coppie di segmenti 3D [p0, p1] e [q0, q1], vettorizzata.
+
+    :param p0, p1: array-like (..., 3) estremi dei primi segmenti
+    :param q0, q1: array-like (..., 3) estremi dei secondi segmenti
+    :param eps: soglia sotto la quale un segmento è considerato degenere (un punto)
+    :return: array (...) delle distanze
+
+    Parametrizza i segmenti come p0 + s*d1 e q0 + t*d2 con s, t in [0, 1] e cerca (s, t) che minimizzano
+    la distanza, gestendo con maschere i casi degeneri e paralleli (schema classico "closest points
+    of two segments").
+    """
+    p0 = np.asarray(p0, dtype=float)
+    q0 = np.asarray(q0, dtype=float)
+    d1 = np.asarray(p1, dtype=float) - p0
+    d2 = np.asarray(q1, dtype=float) - q0
+    r = p0 - q0
+
+    a = np.einsum('...k,...k->...', d1, d1)
+    e = np.einsum('...k,...k->...', d2, d2)
+    f = np.einsum('...k,...k->...', d2, r)
+    c = np.einsum('...k,...k->...', d1, r)
+    b = np.einsum('...k,...k->...', d1, d2)
+
+    p_point = a <= eps
+    q_point = e <= eps
+    safe_a = np.where(p_point, 1.0, a)
+    safe_e = np.where(q_point, 1.0, e)
+
+    # caso generale: s sulla retta, poi t, poi si ricalcola s se t è stato saturato
+    denom = a * e - b * b
+    s = np.where(denom > eps, np.clip((b * f - c * e) / np.where(denom > eps, denom, 1.0), 0.0, 1.0), 0.0)
+    t = (b * s + f) / safe_e
+    s = np.where(t < 0.0, np.clip(-c / safe_a, 0.0, 1.0), np.where(t > 1.0, np.clip((b - c) / safe_a, 0.0, 1.0), s))
+    t = np.clip(t, 0.0, 1.0)
+
+    # segmenti degeneri
+    s = np.where(p_point, 0.0, s)
+    t = np.where(p_point, np.clip(f / safe_e, 0.0, 1.0), t)
+    s = np.where(q_point & ~p_point, np.clip(-c / safe_a, 0.0, 1.0), s)
+    t = np.where(q_point, 0.0, t)
+
+    closest = r + s[..., None] * d1 - t[..., None] * d2
+    return np.linalg.norm(closest, axis=-1)
+
+
+def synchronized_distances(p0, p1, q0, q1):
+    """
+    Distanza minima tra due punti che percorrono i segmenti [p0, p1] e [q0, q1] con la STESSA legge oraria
+    (stessa frazione di percorso s in [0, 1] allo stesso istante), vettorizzata.
+
+    È il caso dei droni che partono insieme con traiettorie rettilinee minimum jerk della stessa durata:
+    la distanza relativa vale r0 + s*dr, con minimo in s* = clip(-r0·dr / |dr|^2, 0, 1).
+
+    :param p0, p1: array-like (..., 3) partenza/arrivo del primo punto
+    :param q0, q1: array-like (..., 3) partenza/arrivo del secondo punto
+    :return: array (...) delle distanze minime
+    """
+    r0 = np.asarray(p0, dtype=float) - np.asarray(q0, dtype=float)
+    dr = (np.asarray(p1, dtype=float) - np.asarray(q1, dtype=float)) - r0
+
+    dd = np.einsum('...k,...k->...', dr, dr)
+    s = np.clip(-np.einsum('...k,...k->...', r0, dr) / np.where(dd > 0, dd, 1.0), 0.0, 1.0)
+    return np.linalg.norm(r0 + s[..., None] * dr, axis=-1)
@@ -1,4 +1,5 @@
 import numpy as np
+from scipy.special import comb
 
 
 def minimum_jerk_1d(p0, pf, T):
@@ -8,7 +9,7 @@ def minimum_jerk_1d(p0, pf, T):
     :param p0: posizione iniziale
     :param pf: posizione finale
     :param T: durata
-    :return: funzione f(t)
+    :return: funzione f(t), con t scalare o array (il risultato ha la shape di t)
     """
     if T <= 0:
         raise ValueError("Duration T must be positive")
@@ -30,7 +31,9 @@ def minimum_jerk_3d(p0, pf, T):
     :param p0: array-like (3,)
     :param pf: array-like (3,)
     :param T: durata
-    :return: funzione f(t) -> np.ndarray (3,)
+    :return: funzione f(t) -> np.ndarray (3,) per t scalare, (..., 3) per t array,
+             con attributi f.derivative(t, order) analitico, f.coefficients (3, K) in tau
+             e f.vectorized = True (accetta array di tempi)
     """
     p0 = np.asarray(p0, dtype=float)
     pf = np.asarray(pf, dtype=float)
@@ -40,11 +43,44 @@ def minimum_jerk_3d(p0, pf, T):
     fz = minimum_jerk_1d(p0[2], pf[2], T)
 
     def trajectory(t):
-        return np.array([fx(t), fy(t), fz(t)])
+        t = np.asarray(t, dtype=float)
+        return np.stack([fx(t), fy(t), fz(t)], axis=-1)
 
+    trajectory.coefficients = minimum_jerk_coefficients(p0, pf)
+    trajectory.derivative = polynomial_derivative(trajectory.coefficients, T)
+    trajectory.vectorized = True
     return trajectory
 
 
+# Picchi del profilo minimum jerk s(tau) = 10 tau^3 - 15 tau^4 + 6 tau^5, con distanza D e durata T:
+#   velocità massima     = 15/8 * D / T            (in tau = 1/2)
+#   accelerazione massima = 10/sqrt(3) * D / T^2    (in tau = 1/2 -+ sqrt(3)/6)
+MIN_JERK_PEAK_VELOCITY = 15.0 / 8.0
+MIN_JERK_PEAK_ACCELERATION = 10.0 / np.sqrt(3.0)
+
+
+def minimum_jerk_duration(distance, max_velocity, max_acceleration):
+    """
+    Durata minima di una traiettoria minimum jerk che rispetta velocità e accelerazione massima.
+    Forma chiusa, vettorizzata: T = max(15 D / (8 v_max), sqrt(10 D / (sqrt(3) a_max))).
+
+    :param distance: distanza (o array di distanze) da percorrere [m]
+    :param max_velocity: velocità massima (scalare o array broadcastabile) [m/s]
+    :param max_acceleration: accelerazione massima (scalare o array broadcastabile) [m/s^2]
+    :return: durata minima (stessa shape del broadcast degli input) [s]
+    """
+    distance = np.asarray(distance, dtype=float)
+    max_velocity = np.asarray(max_velocity, dtype=float)
+    max_acceleration = np.asarray(max_acceleration, dtype=float)
+
+    if np.any(max_velocity <= 0) or np.any(max_acceleration <= 0):
+        raise ValueError("max_velocity and max_acceleration must be positive")
+
+    t_velocity = MIN_JERK_PEAK_VELOCITY * distance / max_velocity
+    t_acceleration = np.sqrt(MIN_JERK_PEAK_ACCELERATION * distance / max_acceleration)
+    return np.maximum(t_velocity, t_acceleration)
+
+
 def numerical_derivative(f, dt=1e-3):
     """
     Derivata numerica centrale di una funzione f(t).
@@ -53,3 +89,262 @@ def numerical_derivative(f, dt=1e-3):
         return (f(t + dt) - f(t - dt)) / (2 * dt)
 
     return df
+
+
+def minimum_jerk_coefficients(p0, pf):
+    """
+    Coefficienti polinomiali della traiettoria minimum jerk nel tempo normalizzato tau = t / T in [0, 1]:
+    p(tau) = p0 + (pf - p0) * (10 tau^3 - 15 tau^4 + 6 tau^5).
+
+    :param p0: array-like (..., 3) posizioni iniziali
+    :param pf: array-like (..., 3) posizioni finali
+    :return: array (..., 3, 6) con i coefficienti c_k di tau^k, k = 0..5
+    """
+    p0 = np.asarray(p0, dtype=float)
+    delta = np.asarray(pf, dtype=float) - p0
+
+    coeffs = np.zeros(p0.shape + (6,))
+    coeffs[..., 0] = p0
+    coeffs[..., 3:] = delta[..., None] * np.array([10.0, -15.0, 6.0])
+    return coeffs
+
+
+def quintic_coefficients(p0, v0, a0, pf, vf, af, T):
+    """
+    Coefficienti della quintica nel tempo normalizzato tau = t / T in [0, 1] con posizione, velocità e
+    accelerazione assegnate agli estremi (non necessariamente nulle). Vettorizzata.
+
+    :param p0, v0, a0: array-like (...) stato iniziale (posizione, velocità, accelerazione)
+    :param pf, vf, af: array-like (...) stato finale
+    :param T: durata (scalare o array broadcastabile)
+    :return: array (..., 6) con i coefficienti c_k di tau^k, k = 0..5
+    """
+    p0, v0, a0, pf, vf, af, T = (np.asarray(x, dtype=float) for x in (p0, v0, a0, pf, vf, af, T))
+
+    # con c0, c1, c2 fissati dallo stato iniziale, c3, c4, c5 risolvono
+    # [1 1 1; 3 4 5; 6 12 20] [c3 c4 c5]^T = [h, dv, da]^T
+    h = pf - p0 - v0 * T - a0 * T ** 2 / 2.0
+    dv = (vf - v0 - a0 * T) * T
+    da = (af - a0) * T ** 2
+
+    c0, c1, c2, h, dv, da = np.broadcast_arrays(p0, v0 * T, a0 * T ** 2 / 2.0, h, dv, da)
+    return np.stack([
+        c0,
+        c1,
+        c2,
+        10.0 * h - 4.0 * dv + 0.5 * da,
+        -15.0 * h + 7.0 * dv - da,
+        6.0 * h - 3.0 * dv + 0.5 * da,
+    ], axis=-1)
+
+
+def polyval_normalized(coeffs, tau, order=0):
+    """
+    Valuta (con lo schema di Horner) il polinomio sum_k c_k tau^k, o la sua derivata order-esima rispetto a tau.
+
+    :param coeffs: array (..., K) coefficienti in potenze crescenti di tau
+    :param tau: array broadcastabile con coeffs[..., 0]
+    :param order: ordine della derivata rispetto a tau
+    :return: array con la shape del broadcast tra coeffs[..., 0] e tau
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    tau = np.asarray(tau, dtype=float)
+    K = coeffs.shape[-1]
+
+    if order >= K:
+        return np.zeros(np.broadcast_shapes(coeffs.shape[:-1], tau.shape))
+
+    # coefficienti della derivata: c_k * k * (k-1) * ... * (k-order+1)
+    if order > 0:
+        k = np.arange(order, K)
+        factor = np.ones(K - order)
+        for m in range(order):
+            factor = factor * (k - m)
+        coeffs = coeffs[..., order:] * factor
+
+    result = coeffs[..., -1] * np.ones_like(tau)
+    for k in range(coeffs.shape[-1] - 2, -1, -1):
+        result = result * tau + coeffs[..., k]
+    return result
+
+
+def polynomial_derivative(coeffs, T):
+    """
+    Derivata analitica di una traiettoria 3D polinomiale nel tempo normalizzato tau = t / T.
+
+    È il "protocollo derivata" usato da Trajectory: una funzione di posizione può esporre
+    f.derivative(t, order) e Trajectory.velocity/acceleration/jerk la useranno al posto delle differenze finite.
+
+    :param coeffs: array-like (3, K) coefficienti per x, y, z
+    :param T: durata
+    :return: funzione derivative(t, order) -> np.ndarray (..., 3), t scalare o array in [0, T]
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+
+    def derivative(t, order=1):
+        tau = np.clip(np.asarray(t, dtype=float), 0.0, T) / T
+        # d^m/dt^m = (1 / T^m) d^m/dtau^m
+        return polyval_normalized(coeffs, tau[..., None], order=order) / T ** order
+
+    return derivative
+
+
+def polynomial_3d(coeffs, T):
+    """
+    Traiettoria 3D polinomiale definita dai coefficienti nel tempo normalizzato tau = t / T.
+
+    :param coeffs: array-like (3, K) coefficienti per x, y, z
+    :param T: durata
+    :return: funzione f(t) -> np.ndarray (3,) per t scalare, (..., 3) per t array,
+             con attributi f.derivative(t, order) analitico, f.coefficients (3, K) in tau
+             e f.vectorized = True (accetta array di tempi)
+    """
+    if T <= 0:
+        raise ValueError("Duration T must be positive")
+    coeffs = np.asarray(coeffs, dtype=float)
+
+    def trajectory(t):
+        tau = np.clip(np.asarray(t, dtype=float), 0.0, T) / T
+        return polyval_normalized(coeffs, tau[..., None])
+
+    trajectory.coefficients = coeffs
+    trajectory.derivative = polynomial_derivative(coeffs, T)
+    trajectory.vectorized = True
+    return trajectory
+
+
+def _binomial_matrix(K):
+    """Matrice (K, K) dei coefficienti binomiali C(k, m) (nulli per m > k)."""
+    k = np.arange(K)
+    return comb(k[:, None], k[None, :])
+
+
+def compose_affine(coeffs, alpha, beta):
+    """
+    Coefficienti del polinomio p(alpha + beta * s) in potenze crescenti di s, dato p in potenze crescenti di tau
+    (es. per riferire un segmento a un suo sottointervallo: tau = alpha + beta * s, s in [0, 1]).
+
+    :param coeffs: array (..., K)
+    :param alpha: array broadcastabile con coeffs[..., 0]
+    :param beta: array broadcastabile con coeffs[..., 0]
+    :return: array (..., K)
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    K = coeffs.shape[-1]
+    alpha = np.asarray(alpha, dtype=float)[..., None, None]
+    beta = np.asarray(beta, dtype=float)[..., None, None]
+
+    # (alpha + beta s)^k = sum_m C(k, m) alpha^(k - m) beta^m s^m
+    k = np.arange(K)[:, None]
+    m = np.arange(K)[None, :]
+    basis = _binomial_matrix(K) * alpha ** np.maximum(k - m, 0) * beta ** m     # (..., K, K)
+    return np.einsum('...k,...km->...m', coeffs, basis)
+
+
+def bernstein_coefficients(coeffs):
+    """
+    Coefficienti di Bernstein su [0, 1] di un polinomio in potenze crescenti di tau.
+    Il polinomio è compreso tra il minimo e il massimo dei coefficienti di Bernstein (inviluppo convesso),
+    che danno quindi limiti garantiti su [0, 1] senza campionare.
+
+    :param coeffs: array (..., K)
+    :return: array (..., K)
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    K = coeffs.shape[-1]
+    binom = _binomial_matrix(K)
+
+    # b_i = sum_{k <= i} C(i, k) / C(n, k) c_k, con n = K - 1
+    basis = binom.T / binom[-1][:, None]    # (K, K): riga k, colonna i
+    return coeffs @ basis
+
+
+# Fasi del profilo S-curve (accelerazione trapezoidale): segno del jerk in ciascuna delle 7 fasi
+#   1 jerk +  | 2 accelerazione costante | 3 jerk -  | 4 crociera | 5 jerk -  | 6 decelerazione costante | 7 jerk +
+SCURVE_JERK_SIGNS = np.array([1.0, 0.0, -1.0, 0.0, -1.0, 0.0, 1.0])
+
+
+def scurve_phase_durations(distance, max_velocity, max_acceleration, max_jerk):
+    """
+    Durate delle 7 fasi del profilo S-curve tempo-ottimo (partenza e arrivo da fermo) su una distanza D,
+    con velocità, accelerazione e jerk limitati. Forma chiusa, vettorizzata.
+
+    Tre casi, a seconda di quale limite viene raggiunto:
+        - v_max raggiunta: c'è una fase di crociera;
+        - solo a_max raggiunta: velocità di picco v_p = (-a^2/j + sqrt(a^4/j^2 + 4 a D)) / 2;
+        - nessuno dei due: v_p = (D sqrt(j) / 2)^(2/3).
+
+    :param distance: distanza (o array di distanze) [m]
+    :param max_velocity, max_acceleration, max_jerk: limiti (scalari o array broadcastabili)
+    :return: (durate (..., 7) [s], jerk di picco (...,) [m/s^3])
+    """
+    D = np.asarray(distance, dtype=float)
+    v = np.asarray(max_velocity, dtype=float)
+    a = np.asarray(max_acceleration, dtype=float)
+    j = np.asarray(max_jerk, dtype=float)
+
+    if np.any(v <= 0) or np.any(a <= 0) or np.any(j <= 0):
+        raise ValueError("max_velocity, max_acceleration and max_jerk must be positive")
+
+    # distanza minima per raggiungere v_max (fase di accelerazione + decelerazione)
+    a_full = np.minimum(a, np.sqrt(v * j))
+    D_full = v * (v / a_full + a_full / j)
+
+    vp_acc = 0.5 * (-a ** 2 / j + np.sqrt(a ** 4 / j ** 2 + 4.0 * a * D))
+    vp_jerk = np.cbrt(D * np.sqrt(j) / 2.0) ** 2
+    vp = np.where(D >= D_full, v, np.where(vp_acc >= a ** 2 / j, vp_acc, vp_jerk))
+
+    a_peak = np.minimum(a, np.sqrt(vp * j))
+    t_jerk = a_peak / j
+    t_acc = np.maximum(np.where(a_peak > 0, vp / np.where(a_peak > 0, a_peak, 1.0), 0.0) - t_jerk, 0.0)
+    t_cruise = np.maximum(np.where(vp > 0, D / np.where(vp > 0, vp, 1.0), 0.0) - (t_acc + 2.0 * t_jerk), 0.0)
+
+    durations = np.stack([t_jerk, t_acc, t_jerk, t_cruise, t_jerk, t_acc, t_jerk], axis=-1)
+    return durations, np.broadcast_to(j, durations.shape[:-1])
+
+
+def scurve_duration(distance, max_velocity, max_acceleration, max_jerk):
+    """
+    Durata minima del profilo S-curve (somma delle 7 fasi), vettorizzata.
+    """
+    durations, _ = scurve_phase_durations(distance, max_velocity, max_acceleration, max_jerk)
+    return durations.sum(axis=-1)
+
+
+def scurve_coefficients(p0, pf, max_velocity, max_acceleration, max_jerk):
+    """
+    Profilo S-curve rettilineo da p0 a pf come polinomio cubico a tratti (7 segmenti), per tutto lo sciame.
+
+    Ogni segmento è espresso nel proprio tempo normalizzato tau in [0, 1] (come PiecewiseTrajectory): con
+    s, v, a all'inizio del segmento, jerk J e durata L, lungo la direzione u = (pf - p0) / |pf - p0|:
+    p(tau) = p0 + u (s + v L tau + a L^2 tau^2 / 2 + J L^3 tau^3 / 6).
+    Riscalare i breakpoints (rallentare il profilo) non modifica i coefficienti.
+
+    :param p0: array-like (..., 3) posizioni iniziali
+    :param pf: array-like (..., 3) posizioni finali
+    :return: (breakpoints (..., 8) [s], coefficienti (..., 7, 3, 4))
+    """
+    p0 = np.asarray(p0, dtype=float)
+    delta = np.asarray(pf, dtype=float) - p0
+    distance = np.linalg.norm(delta, axis=-1)
+    direction = delta / np.where(distance > 0, distance, 1.0)[..., None]
+
+    durations, jerk = scurve_phase_durations(distance, max_velocity, max_acceleration, max_jerk)
+    breakpoints = np.concatenate([np.zeros(durations.shape[:-1] + (1,)), np.cumsum(durations, axis=-1)], axis=-1)
+
+    # integrazione esatta del jerk costante a tratti: coefficienti scalari (..., 7, 4) lungo la direzione
+    scalar = np.zeros(durations.shape + (4,))
+    s = np.zeros(durations.shape[:-1])
+    vel = np.zeros_like(s)
+    acc = np.zeros_like(s)
+    for k in range(7):
+        L = durations[..., k]
+        J = SCURVE_JERK_SIGNS[k] * jerk
+        scalar[..., k, :] = np.stack([s, vel * L, acc * L ** 2 / 2.0, J * L ** 3 / 6.0], axis=-1)
+        s = s + vel * L + acc * L ** 2 / 2.0 + J * L ** 3 / 6.0
+        vel = vel + acc * L + J * L ** 2 / 2.0
+        acc = acc + J * L
+
+    coeffs = scalar[..., None, :] * direction[..., None, :, None]     # (..., 7, 3, 4)
+    coeffs[..., 0] += p0[..., None, :]
+    return breakpoints, coeffs
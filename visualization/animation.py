@@ -3,13 +3,11 @@ import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
 def sample_bounds(trajectories, t_start, t_end, dt=0.05):
-    xs, ys, zs = [], [], []
     t_values = np.arange(t_start, t_end + dt, dt)
-    for t in t_values:
-        for traj in trajectories.values():
-            p = traj.position(t)
-            xs.append(p[0]); ys.append(p[1]); zs.append(p[2])
-    return (min(xs), max(xs)), (min(ys), max(ys)), (min(zs), max(zs))
+    # una valutazione vettorizzata per traiettoria: (num_traj * T, 3)
+    points = np.concatenate([traj.position(t_values) for traj in trajectories.values()])
+    (xmin, ymin, zmin), (xmax, ymax, zmax) = points.min(axis=0), points.max(axis=0)
+    return (xmin, xmax), (ymin, ymax), (zmin, zmax)
 
 def animate_3d(all_trajectories, meta, dt_anim=0.05, margin=0.5):
     total_duration = meta.get("total_duration", 0.0)